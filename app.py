@@ -1,57 +1,348 @@
-from fastapi import FastAPI, Request, Form
+from fastapi import FastAPI, Request, Form, Header
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
-import pandas as pd
+from fastapi.responses import HTMLResponse, JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, get_args
 import numpy as np
-from sklearn.linear_model import Ridge
-from sklearn.preprocessing import StandardScaler
-import pickle
+import hashlib
+import hmac
+import logging
 import os
-from typing import Optional
-import uvicorn
-import plotly.graph_objects as go
-import plotly.express as px
 import json
-from io import BytesIO
-import base64
+import asyncio
+import time
+import metrics
+from preprocessing import DEFAULT_VALUES, FEATURE_FIELDS
+from inference import (ARTIFACT_DIR, BUNDLE_DIR, SPARSE_INFERENCE, IntervalUnavailableError, LinearPredictor,
+                       check_explain, encode_frame, fingerprint, load_artifacts, predict_frame,
+                       require_interval)
+from executor import InferenceExecutor, MicroBatcher, QueueFullError
+from cache import PredictionCache, SqliteStore, prediction_key
+from metrics import Counter, Gauge, Histogram, Registry, Timings
+from schema import build_property_model, category_type
+from pydantic import ValidationError
+from validation import InputValidator, InvalidInputError
+from comparables import build_index
 
 app = FastAPI(title="House Price Prediction API", version="1.0.0")
 
+logger = logging.getLogger(__name__)
+
+# Pages, assets and data are found next to this file, not the working directory
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
 # Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", StaticFiles(directory=os.path.join(APP_DIR, "static")), name="static")
 
 # Templates
-templates = Jinja2Templates(directory="templates")
+templates = Jinja2Templates(directory=os.path.join(APP_DIR, "templates"))
+
+# Where prediction work runs: "thread" or "process" pool, or "inline" on the
+# event loop. Calls beyond workers + max queue are rejected with a 503.
+INFERENCE_EXECUTOR = os.environ.get("INFERENCE_EXECUTOR", "thread")
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", min(4, os.cpu_count() or 1)))
+INFERENCE_MAX_QUEUE = int(os.environ.get("INFERENCE_MAX_QUEUE", 64))
+
+# Optionally coalesce concurrent /api/predict calls into one scoring call,
+# waiting at most API_BATCH_MAX_LATENCY_MS for up to API_BATCH_MAX_SIZE rows
+API_BATCHING = os.environ.get("API_BATCHING", "0") == "1"
+API_BATCH_MAX_LATENCY_MS = float(os.environ.get("API_BATCH_MAX_LATENCY_MS", 2))
+API_BATCH_MAX_SIZE = int(os.environ.get("API_BATCH_MAX_SIZE", 64))
+
+# Cache /api/predict results keyed on the defaulted input and model version.
+# PREDICTION_CACHE_SIZE=0 disables it, PREDICTION_CACHE_TTL is in seconds
+# (0 = no expiry) and PREDICTION_CACHE_PATH names a SQLite file that lets
+# several uvicorn workers share hits.
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 10000))
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", 0))
+PREDICTION_CACHE_PATH = os.environ.get("PREDICTION_CACHE_PATH", "")
+
+# Hot reload: POST /admin/reload (enabled only when ADMIN_TOKEN is set, and
+# requires it in the X-Admin-Token header), or poll the artifacts every MODEL_WATCH_INTERVAL
+# seconds and reload when they change (0 = no polling)
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", 0))
+
+# Check every record against the training vocabulary and ranges before scoring;
+# unknown categories and non-finite or out-of-domain numbers are rejected.
+# Out-of-range numbers are only counted unless CLAMP_OUT_OF_RANGE=1.
+INPUT_VALIDATION = os.environ.get("INPUT_VALIDATION", "1") != "0"
+CLAMP_OUT_OF_RANGE = os.environ.get("CLAMP_OUT_OF_RANGE", "0") == "1"
+
+# Largest number of values one field of a what-if sweep may take
+SWEEP_MAX_VALUES = 1000
+# Values a numeric sweep given as start/stop takes when "steps" is not set
+SWEEP_DEFAULT_STEPS = 21
+
+# Similar historical sales returned per property by the comparables lookup
+COMPARABLES_DEFAULT = 5
+COMPARABLES_MAX = 50
+
+# Prediction interval shown with the valuation on the results page
+PAGE_INTERVAL_LEVEL = 0.9
+
+# Rows from the training data a new model must score sensibly before it is swapped in
+SMOKE_SET_SIZE = 20
+
+# Prometheus-style metrics served at /metrics; REQUEST_METRICS=0 removes the
+# request middleware and turns every stage timer into a no-op
+metrics.ENABLED = os.environ.get("REQUEST_METRICS", "1") != "0"
+
+registry = Registry()
+REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route, method and status", ["route", "method", "status"]
+))
+REQUEST_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "End-to-end request latency by route", ["route"]
+))
+STAGE_LATENCY = registry.register(Histogram(
+    "prediction_stage_duration_seconds", "Time spent in each phase of a prediction request", ["endpoint", "stage"]
+))
+PREDICTION_ERRORS = registry.register(Counter(
+    "prediction_errors_total", "Failed prediction requests by endpoint and kind", ["endpoint", "kind"]
+))
+MODEL_INFO = registry.register(Gauge("model_info", "Version of the model serving requests", ["model_version"]))
+POOL_STATS = registry.register(Gauge("inference_pool", "Inference pool counters and queue state", ["stat"]))
+CACHE_STATS = registry.register(Gauge("prediction_cache", "Prediction cache counters and size", ["stat"]))
+VALIDATION_STATS = registry.register(Gauge(
+    "input_validation", "Rejected and flagged input values by field since the model was loaded", ["field", "kind"]
+))
+
+# Training data behind the analytics page and the comparable-sales index
+DATA_PATH = os.path.join(APP_DIR, "Property_Price_Train.csv")
+
+# Held-out and cross-validation scores written by train_model.py
+METRICS_PATH = os.path.join(ARTIFACT_DIR, "model_metrics.json")
 
 # Global variables for model and scaler
 model = None
 scaler = None
 feature_columns = None
+encoder = None
+predictor = None
+bundle = None
+model_version = None
+property_model = None
+validator = None
+serving = None
+executor = None
+batcher = None
+prediction_cache = None
+reload_lock = asyncio.Lock()
+watch_task = None
+
+# Rendered analytics page for the current model version:
+# {model_version: (body, etag, last_modified_header, last_modified_timestamp)}
+analytics_cache = {}
+
+def activate_model(state):
+    """Make a loaded model the one that answers requests"""
+    global serving, model, scaler, feature_columns, encoder, predictor, bundle, model_version, property_model, validator
+    
+    # Scoring functions read `serving` once per call, so this single assignment
+    # is the atomic swap; the other globals mirror it for the pages
+    serving = state
+    model, scaler, bundle = state.model, state.scaler, state.bundle
+    feature_columns, encoder, predictor = state.feature_columns, state.encoder, state.predictor
+    model_version = state.version
+    property_model = build_property_model(state.encoder) if state.encoder is not None else None
+    validator = None
+    if INPUT_VALIDATION and state.encoder is not None:
+        ranges = state.bundle.manifest.get('metadata', {}).get('ranges') if state.bundle else None
+        validator = InputValidator(state.encoder, ranges, CLAMP_OUT_OF_RANGE)
+    
+    # Predictions of previously loaded artifacts must not be served again
+    if prediction_cache is not None:
+        prediction_cache.clear()
+
+def index_comparables(state):
+    """Index the training sales with a loaded model's encoder and scaler, before it answers requests"""
+    if state.encoder is not None and state.bundle is not None and os.path.exists(DATA_PATH):
+        state.comparables = build_index(state, DATA_PATH)
+    return state
 
 def load_model():
     """Load the trained model and scaler"""
-    global model, scaler, feature_columns
+    activate_model(index_comparables(load_artifacts()))
+
+def validate_model(state):
+    """Score the smoke set with a freshly loaded model; raise ValueError if it is unusable"""
+    import pandas as pd
     
-    # Load the model
-    if os.path.exists("model.pkl"):
-        with open("model.pkl", "rb") as f:
-            model = pickle.load(f)
+    if state.predictor is None or state.encoder is None:
+        raise ValueError("Model artifacts are missing")
+    if state.bundle is not None and fingerprint(state.bundle.arrays) != state.version:
+        raise ValueError("Model bundle is incomplete or changed while loading")
     
-    # Load the scaler
-    if os.path.exists("scaler.pkl"):
-        with open("scaler.pkl", "rb") as f:
-            scaler = pickle.load(f)
+    golden_rows = check_golden(state)
     
-    # Load feature columns
-    if os.path.exists("feature_columns.pkl"):
-        with open("feature_columns.pkl", "rb") as f:
-            feature_columns = pickle.load(f)
+    smoke = pd.read_csv(DATA_PATH, nrows=10 * SMOKE_SET_SIZE)
+    # Derived as in train_model.py
+    smoke["House_life"] = state.encoder.house_life_year - smoke["Construction_Year"]
+    # Missing values fall back to the API defaults, as in the batch endpoint
+    required = [field for field in FEATURE_FIELDS if field not in DEFAULT_VALUES]
+    smoke = smoke[FEATURE_FIELDS].dropna(subset=required).head(SMOKE_SET_SIZE).astype(object)
+    records = smoke.where(smoke.notna(), None).to_dict("records")
+    predictions = predict_records(records, state)
+    if not (np.isfinite(predictions).all() and (predictions > 0).all()):
+        raise ValueError("Model produced invalid predictions on the smoke set")
+    
+    result = {"rows": len(predictions), "mean_prediction": float(predictions.mean()), "golden_rows": golden_rows}
+    if serving is not None and serving.predictor is not None:
+        current = predict_records(records, serving)
+        result["max_relative_change"] = float(np.max(np.abs(predictions - current) / current))
+    return result
+
+def check_golden(state):
+    """Encode the golden rows saved with the bundle through every serving path.
+
+    train_model.py saves a few raw training records together with the design
+    matrix rows it fitted on. Raises ValueError unless each path reproduces
+    them exactly; returns the number of rows checked (0 for bundles without).
+    """
+    import pandas as pd
+
+    if state.bundle is None or 'golden_features' not in state.bundle.arrays:
+        return 0
+    encoder = state.encoder
+    records = state.bundle.manifest['metadata']['golden_records']
+    expected = np.asarray(state.bundle.arrays['golden_features'])
+    
+    def densify(indices, values):
+        row = np.zeros(encoder.n_features)
+        row[indices] = values
+        return row
+    
+    frame = pd.DataFrame(records)
+    features, reasons = encoder.prepare_frame(frame)
+    encoded = {
+        "encode": np.array([encoder.encode(record) for record in records]),
+        "encode_sparse": np.array([densify(*encoder.encode_sparse(record)) for record in records]),
+        "encode_frame_sparse": encoder.encode_frame_sparse(frame).toarray(),
+        "encode_frame_dense": encoder.encode_frame_dense(frame),
+        "score.py": encoder.encode_frame_sparse(features[(reasons == "").to_numpy()]).toarray(),
+        "predict_records": encoder.encode_frame_sparse(records_frame(records, encoder)).toarray(),
+    }
+    different = [path for path, X in encoded.items() if not np.array_equal(X, expected)]
+    if different:
+        raise ValueError(f"Serving encodes the golden training rows differently from training: {', '.join(different)}")
+    return len(records)
+
+def create_executor():
+    """Inference pool for the live model; forked pool processes inherit it"""
+    return InferenceExecutor(
+        INFERENCE_EXECUTOR, INFERENCE_WORKERS, INFERENCE_MAX_QUEUE, initializer=load_model
+    )
+
+async def run_inference(fn, *args):
+    """Run prediction work on whichever pool is current"""
+    return await executor.run(fn, *args)
+
+async def run_timed(fn, *args):
+    """Run prediction work that returns ``(result, timings)`` and record its stage times in this process"""
+    result, timings = await executor.run(fn, *args)
+    timings.observe(STAGE_LATENCY)
+    return result
+
+async def reload_model():
+    """Load new artifacts in the background, validate them and swap them in"""
+    global executor
+    async with reload_lock:
+        previous_version = model_version
+        state = await run_in_threadpool(load_artifacts)
+        smoke = await run_in_threadpool(validate_model, state)
+        await run_in_threadpool(index_comparables, state)
+        activate_model(state)
+        
+        if INFERENCE_EXECUTOR == "process":
+            # Pool processes hold their own copy of the model: start a new pool
+            # and let calls already queued on the old one finish there
+            old_executor, executor = executor, create_executor()
+            await run_in_threadpool(old_executor.shutdown, True)
+        
+        return {"previous_version": previous_version, "model_version": model_version, "smoke": smoke}
+
+def artifact_signature():
+    """Modification times of the artifacts load_artifacts reads"""
+    paths = [os.path.join(BUNDLE_DIR, "manifest.json")]
+    paths += [os.path.join(ARTIFACT_DIR, name) for name in ("model.pkl", "scaler.pkl", "feature_columns.pkl")]
+    return tuple(os.path.getmtime(path) if os.path.exists(path) else None for path in paths)
+
+async def watch_artifacts():
+    """Reload the model whenever train_model.py writes new artifacts"""
+    signature = artifact_signature()
+    while True:
+        await asyncio.sleep(MODEL_WATCH_INTERVAL)
+        current = artifact_signature()
+        if current == signature:
+            continue
+        try:
+            result = await reload_model()
+            logger.info("Reloaded model %s -> %s", result['previous_version'], result['model_version'])
+            signature = current
+        except Exception:
+            # Keep serving the old model; retry on the next change
+            logger.exception("Model reload failed")
+            signature = current
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize the model on startup"""
+    """Initialize the model and the inference pool on startup"""
+    global executor, batcher, prediction_cache, watch_task
+    if PREDICTION_CACHE_SIZE > 0:
+        store = SqliteStore(PREDICTION_CACHE_PATH) if PREDICTION_CACHE_PATH else None
+        prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL, store)
     load_model()
+    # Created after the model is loaded so forked pool processes inherit it
+    executor = create_executor()
+    if API_BATCHING:
+        batcher = MicroBatcher(score_api_inputs, run_timed, API_BATCH_MAX_LATENCY_MS, API_BATCH_MAX_SIZE)
+    if MODEL_WATCH_INTERVAL > 0:
+        watch_task = asyncio.create_task(watch_artifacts())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the artifact watcher and the inference pool"""
+    if watch_task is not None:
+        watch_task.cancel()
+    if executor is not None:
+        executor.shutdown()
+
+async def record_request_metrics(request: Request, call_next):
+    """Count and time every request by its route template"""
+    start = time.perf_counter()
+    request.state.started_at = start
+    response = await call_next(request)
+    # Label by template ("/api/predict"), by mount ("/static") for static files,
+    # never by raw path, so label cardinality stays bounded
+    route = request.scope.get("route")
+    path = route.path if route is not None else (request.scope.get("root_path") or "unmatched")
+    REQUESTS.inc(path, request.method, str(response.status_code))
+    REQUEST_LATENCY.observe(time.perf_counter() - start, path)
+    return response
+
+if metrics.ENABLED:
+    app.middleware("http")(record_request_metrics)
+
+def record_parse_time(request, endpoint):
+    """Time from the request arriving until the handler runs: routing plus form/query parsing"""
+    started_at = getattr(request.state, "started_at", None)
+    if started_at is not None:
+        STAGE_LATENCY.observe(time.perf_counter() - started_at, endpoint, "parse")
+
+def interval_unavailable_response(e):
+    """Intervals asked of a model saved without interval data"""
+    return JSONResponse(status_code=409, content={"error": str(e)})
+
+def busy_response():
+    """Fast rejection when the inference queue is full"""
+    return JSONResponse(
+        status_code=503,
+        content={"error": "Server busy, please retry shortly"},
+        headers={"Retry-After": "1"}
+    )
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
@@ -65,28 +356,61 @@ async def about(request: Request):
     """About page with project details"""
     return templates.TemplateResponse("about.html", {"request": request})
 
+def render_analytics_page():
+    """Render the analytics page for the loaded model and cache it by model version"""
+    version = model_version
+    cached = analytics_cache.get(version)
+    if cached is not None:
+        return cached
+    
+    metrics = load_metrics()
+    selected = metrics['selected'] if metrics else None
+    body = templates.get_template("analytics.html").render(
+        price_distribution=create_price_distribution_plot(),
+        feature_importance=create_feature_importance_plot(),
+        model_comparison=create_model_comparison_plot(metrics),
+        model_accuracy=f"{selected['test_r2'] * 100:.2f}%" if selected else "n/a"
+    ).encode("utf-8")
+    
+    # Figures use fixed div ids, so every worker renders identical bytes and ETags
+    etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+    sources = [DATA_PATH, os.path.join(BUNDLE_DIR, "manifest.json"), os.path.join(ARTIFACT_DIR, "model.pkl"),
+               METRICS_PATH]
+    last_modified = max(os.path.getmtime(path) for path in sources if os.path.exists(path))
+    
+    entry = (body, etag, formatdate(last_modified, usegmt=True), last_modified)
+    analytics_cache.clear()
+    analytics_cache[version] = entry
+    return entry
+
+def is_not_modified(request, etag, last_modified):
+    """Evaluate If-None-Match / If-Modified-Since revalidation headers"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
 @app.get("/analytics", response_class=HTMLResponse)
 async def analytics(request: Request):
-    """Analytics page with interactive plots"""
-    # Create sample data for plots
-    sample_data = {
-        'price_range': ['$100k-$200k', '$200k-$300k', '$300k-$400k', '$400k-$500k', '$500k+'],
-        'count': [450, 380, 290, 180, 159],
-        'avg_price': [150000, 250000, 350000, 450000, 600000]
-    }
-    
-    # Create interactive plots
-    price_distribution = create_price_distribution_plot()
-    feature_importance = create_feature_importance_plot()
-    model_comparison = create_model_comparison_plot()
+    """Analytics page with interactive plots, rendered once per model version"""
+    entry = analytics_cache.get(model_version)
+    if entry is None:
+        # Building the Plotly figures is CPU-bound; keep it off the event loop
+        entry = await run_in_threadpool(render_analytics_page)
+    body, etag, last_modified_header, last_modified = entry
     
-    return templates.TemplateResponse("analytics.html", {
-        "request": request,
-        "price_distribution": price_distribution,
-        "feature_importance": feature_importance,
-        "model_comparison": model_comparison,
-        "sample_data": sample_data
-    })
+    headers = {"ETag": etag, "Last-Modified": last_modified_header, "Cache-Control": "no-cache"}
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(body, headers=headers)
 
 @app.get("/predict", response_class=HTMLResponse)
 async def predict_page(request: Request):
@@ -115,7 +439,7 @@ async def predict_price(
     roof_design: str = Form(...),
     exterior1st: str = Form(...),
     exterior2nd: str = Form(...),
-    brick_veneer_type: str = Form(...),
+    brick_veneer_type: Optional[str] = Form(None),
     brick_veneer_area: float = Form(...),
     exterior_material: str = Form(...),
     exterior_condition: str = Form(...),
@@ -161,8 +485,9 @@ async def predict_price(
     sale_condition: str = Form(...)
 ):
     """Predict house price based on input features"""
+    record_parse_time(request, "predict")
     
-    if model is None or scaler is None or feature_columns is None:
+    if predictor is None or encoder is None:
         return templates.TemplateResponse(
             "predict.html", 
             {"request": request, "error": "Model not loaded. Please train the model first."}
@@ -236,61 +561,45 @@ async def predict_price(
             'Sale_Condition': sale_condition
         }
         
-        # Convert to DataFrame
-        df = pd.DataFrame([input_data])
-        
-        # Apply the same preprocessing as in the notebook
-        # Transform numerical features
-        df['Lot_Extent'] = np.log(df['Lot_Extent'])
-        df['Lot_Size'] = np.log(df['Lot_Size'])
-        df['Brick_Veneer_Area'] = df['Brick_Veneer_Area'] ** (1/3)
-        df['BsmtFinSF2'] = df['BsmtFinSF2'] ** (1/3)
-        df['Screen_Lobby_Area'] = df['Screen_Lobby_Area'] ** (1/3)
+        if validator is not None:
+            validator.check(input_data)
         
-        # Clip negative areas to 0
-        df['Garage_Area'] = df['Garage_Area'].clip(lower=0)
-        df['W_Deck_Area'] = df['W_Deck_Area'].clip(lower=0)
-        df['Open_Lobby_Area'] = df['Open_Lobby_Area'].clip(lower=0)
-        df['Enclosed_Lobby_Area'] = df['Enclosed_Lobby_Area'].clip(lower=0)
+        # Show a price range alongside the point estimate when the model has interval data
+        level = PAGE_INTERVAL_LEVEL if serving.interval is not None else None
+        prediction, version, bounds = await run_timed(score_record, input_data, level)
         
-        # Convert discrete numerical to categorical
-        discrete_cols = ['Garage_Size', 'Fireplaces', 'Rooms_Above_Grade', 'Bedroom_Above_Grade',
-                        'Half_Bathroom_Above_Grade', 'Full_Bathroom_Above_Grade', 
-                        'Underground_Half_Bathroom', 'Underground_Full_Bathroom', 
-                        'House_Condition', 'Overall_Material', 'Building_Class']
+        price_range = None
+        if bounds:
+            price_range = f"{PAGE_INTERVAL_LEVEL:.0%} range ${bounds['lower']:,.0f} to ${bounds['upper']:,.0f}"
         
-        for col in discrete_cols:
-            if col in df.columns:
-                df[col] = df[col].astype('object')
-        
-        # Create dummy variables
-        df_encoded = pd.get_dummies(df, drop_first=False)
-        
-        # Align columns with training data - optimized to avoid fragmentation
-        missing_cols = [col for col in feature_columns if col not in df_encoded.columns]
-        if missing_cols:
-            # Create a DataFrame with missing columns and concatenate
-            missing_df = pd.DataFrame(0, index=df_encoded.index, columns=missing_cols)
-            df_encoded = pd.concat([df_encoded, missing_df], axis=1)
-        
-        df_encoded = df_encoded[feature_columns]
-        
-        # Scale the features
-        df_scaled = scaler.transform(df_encoded)
-        
-        # Make prediction
-        prediction = model.predict(df_scaled)[0]
+        with STAGE_LATENCY.time("predict", "render"):
+            return templates.TemplateResponse(
+                "predict.html", 
+                {
+                    "request": request, 
+                    "prediction": f"${prediction:,.2f}",
+                    "price_range": price_range,
+                    "model_version": version,
+                    "input_data": input_data
+                }
+            )
         
+    except InvalidInputError as e:
+        PREDICTION_ERRORS.inc("predict", "invalid")
         return templates.TemplateResponse(
             "predict.html", 
-            {
-                "request": request, 
-                "prediction": f"${prediction:,.2f}",
-                "input_data": input_data
-            }
+            {"request": request, "error": str(e)}
+        )
+    except QueueFullError:
+        PREDICTION_ERRORS.inc("predict", "busy")
+        return templates.TemplateResponse(
+            "predict.html", 
+            {"request": request, "error": "The server is busy. Please try again in a moment."},
+            status_code=503,
+            headers={"Retry-After": "1"}
         )
-        
     except Exception as e:
+        PREDICTION_ERRORS.inc("predict", "error")
         return templates.TemplateResponse(
             "predict.html", 
             {"request": request, "error": f"Error making prediction: {str(e)}"}
@@ -298,6 +607,7 @@ async def predict_price(
 
 @app.get("/api/predict")
 async def predict_api(
+    request: Request,
     building_class: int,
     lot_size: int,
     overall_material: int,
@@ -308,11 +618,18 @@ async def predict_api(
     garage_area: int = 0,
     neighborhood: str = "NAmes",
     house_type: str = "1Fam",
-    foundation_type: str = "PConc"
+    foundation_type: str = "PC",
+    interval: Optional[float] = None,
+    explain: Optional[int] = None
 ):
-    """Simple API endpoint for basic predictions"""
+    """Simple API endpoint for basic predictions.
+
+    Pass ``interval`` (e.g. 0.9) for the bounds of a prediction interval at that level,
+    and ``explain`` (e.g. 5) for the fields that moved the price most.
+    """
+    record_parse_time(request, "api_predict")
     
-    if model is None:
+    if predictor is None:
         return {"error": "Model not loaded"}
     
     try:
@@ -332,81 +649,546 @@ async def predict_api(
         }
         
         # Add default values for required features
-        default_values = {
-            'Zoning_Class': 'RL', 'Lot_Extent': 60.0, 'Lane_Type': 'Grvl',
-            'Property_Shape': 'Reg', 'Land_Outline': 'Lvl', 'Lot_Configuration': 'Inside',
-            'Property_Slope': 'Gtl', 'Condition1': 'Norm', 'House_Design': '1Story',
-            'Roof_Design': 'Gable', 'Exterior1st': 'VinylSd', 'Exterior2nd': 'VinylSd',
-            'Brick_Veneer_Type': 'None', 'Brick_Veneer_Area': 0.0, 'Exterior_Material': 'VinylSd',
-            'Exterior_Condition': 'TA', 'Basement_Height': 'TA', 'Basement_Condition': 'TA',
-            'Exposure_Level': 'No', 'BsmtFinType1': 'GLQ', 'BsmtFinSF1': 0,
-            'BsmtFinType2': 'Unf', 'BsmtFinSF2': 0, 'BsmtUnfSF': 0, 'Total_Basement_Area': 0,
-            'Heating_Quality': 'TA', 'Air_Conditioning': 'N', 'Electrical_System': 'SBrkr',
-            'Second_Floor_Area': 0, 'Underground_Full_Bathroom': 0, 'Underground_Half_Bathroom': 0,
-            'Full_Bathroom_Above_Grade': 1, 'Half_Bathroom_Above_Grade': 0, 'Bedroom_Above_Grade': 3,
-            'Kitchen_Quality': 'TA', 'Rooms_Above_Grade': 6, 'Functional_Rate': 'Typ',
-            'Fireplaces': 0, 'Fireplace_Quality': 'No_Fireplace', 'Garage': 'Attchd',
-            'Garage_Finish_Year': 'Unf', 'Garage_Size': 2, 'Garage_Quality': 'TA',
-            'Garage_Condition': 'TA', 'Pavedd_Drive': 'Y', 'W_Deck_Area': 0,
-            'Open_Lobby_Area': 0, 'Enclosed_Lobby_Area': 0, 'Screen_Lobby_Area': 0,
-            'Fence_Quality': 'No_Fence', 'Sale_Type': 'WD', 'Sale_Condition': 'Normal'
-        }
+        input_data.update(DEFAULT_VALUES)
+        if validator is not None:
+            validator.check(input_data)
         
-        input_data.update(default_values)
+        # Repeated listings are answered from the cache without touching the pool;
+        # intervals and attributions are computed with the price they describe
+        version = model_version
+        prediction = None
+        details = {}
+        if interval is not None or explain is not None:
+            prediction, version, details = await run_timed(
+                score_record, input_data, interval, explain, "api_predict"
+            )
+        elif prediction_cache is not None:
+            with STAGE_LATENCY.time("api_predict", "cache"):
+                prediction = prediction_cache.get(prediction_key(input_data, version))
+        if prediction is None:
+            if batcher is not None:
+                prediction, version = await batcher.submit(input_data)
+            else:
+                prediction, version = await run_timed(score_api_input, input_data)
+            if prediction_cache is not None:
+                prediction_cache.set(prediction_key(input_data, version), prediction)
         
-        # Convert to DataFrame and process
-        df = pd.DataFrame([input_data])
-        
-        # Apply transformations
-        df['Lot_Extent'] = np.log(df['Lot_Extent'])
-        df['Lot_Size'] = np.log(df['Lot_Size'])
-        df['Brick_Veneer_Area'] = df['Brick_Veneer_Area'] ** (1/3)
-        df['BsmtFinSF2'] = df['BsmtFinSF2'] ** (1/3)
-        df['Screen_Lobby_Area'] = df['Screen_Lobby_Area'] ** (1/3)
+        result = {
+            "predicted_price": f"${prediction:,.2f}",
+            "predicted_price_raw": prediction,
+            "model_version": version,
+            "input_features": input_data,
+            **details
+        }
+        return result
         
-        # Convert discrete numerical to categorical
-        discrete_cols = ['Garage_Size', 'Fireplaces', 'Rooms_Above_Grade', 'Bedroom_Above_Grade',
-                        'Half_Bathroom_Above_Grade', 'Full_Bathroom_Above_Grade', 
-                        'Underground_Half_Bathroom', 'Underground_Full_Bathroom', 
-                        'House_Condition', 'Overall_Material', 'Building_Class']
+    except InvalidInputError as e:
+        PREDICTION_ERRORS.inc("api_predict", "invalid")
+        return JSONResponse(status_code=422, content={"error": str(e), "fields": e.problems})
+    except IntervalUnavailableError as e:
+        PREDICTION_ERRORS.inc("api_predict", "no_interval")
+        return interval_unavailable_response(e)
+    except QueueFullError:
+        PREDICTION_ERRORS.inc("api_predict", "busy")
+        return busy_response()
+    except Exception as e:
+        PREDICTION_ERRORS.inc("api_predict", "error")
+        return {"error": str(e)}
+
+@app.post("/api/predict/full")
+async def predict_full_api(
+    request: Request,
+    interval: Optional[float] = None,
+    explain: Optional[int] = None,
+    comparables: Optional[int] = None
+):
+    """JSON API endpoint: score one complete property record, validated against the training vocabulary.
+
+    Pass ``interval`` (e.g. 0.9) for the bounds of a prediction interval at that level,
+    ``explain`` (e.g. 5) for the fields that moved the price most and
+    ``comparables`` (e.g. 5) for the most similar historical sales.
+    """
+    
+    if predictor is None or property_model is None:
+        return {"error": "Model not loaded"}
+    
+    try:
+        body = await request.body()
+        input_data = property_model.model_validate_json(body).model_dump()
+        if validator is not None:
+            validator.check(input_data)
+        record_parse_time(request, "predict_full")
         
-        for col in discrete_cols:
-            if col in df.columns:
-                df[col] = df[col].astype('object')
+        prediction, version, details = await run_timed(
+            score_record, input_data, interval, explain, "predict_full"
+        )
         
-        # Create dummy variables
-        df_encoded = pd.get_dummies(df, drop_first=False)
+        result = {"predicted_price": prediction, "model_version": version, **details}
+        if comparables is not None:
+            result["comparables"] = (await executor.run(comparable_sales, [input_data], comparables))[0]
         
-        # Align columns with training data - optimized to avoid fragmentation
-        if feature_columns is not None:
-            missing_cols = [col for col in feature_columns if col not in df_encoded.columns]
-            if missing_cols:
-                # Create a DataFrame with missing columns and concatenate
-                missing_df = pd.DataFrame(0, index=df_encoded.index, columns=missing_cols)
-                df_encoded = pd.concat([df_encoded, missing_df], axis=1)
-            df_encoded = df_encoded[feature_columns]
+        with STAGE_LATENCY.time("predict_full", "render"):
+            return JSONResponse(result)
         
-        # Scale and predict
-        if scaler is not None:
-            df_scaled = scaler.transform(df_encoded)
-            prediction = model.predict(df_scaled)[0]
+    except ValidationError as e:
+        PREDICTION_ERRORS.inc("predict_full", "invalid")
+        return JSONResponse(status_code=422, content={"detail": e.errors(include_url=False, include_context=False, include_input=False)})
+    except InvalidInputError as e:
+        PREDICTION_ERRORS.inc("predict_full", "invalid")
+        detail = [{"type": "value_error", "loc": [p["field"]], "msg": p["error"]} for p in e.problems]
+        return JSONResponse(status_code=422, content={"detail": detail})
+    except IntervalUnavailableError as e:
+        PREDICTION_ERRORS.inc("predict_full", "no_interval")
+        return interval_unavailable_response(e)
+    except QueueFullError:
+        PREDICTION_ERRORS.inc("predict_full", "busy")
+        return busy_response()
+    except Exception as e:
+        PREDICTION_ERRORS.inc("predict_full", "error")
+        return {"error": str(e)}
+
+@app.get("/api/predict/full/schema")
+async def predict_full_schema():
+    """JSON Schema of the record /api/predict/full accepts for the loaded model"""
+    if property_model is None:
+        return {"error": "Model not loaded"}
+    return property_model.model_json_schema()
+
+@app.post("/api/predict/sweep")
+async def predict_sweep_api(request: Request):
+    """What-if API endpoint: price a base property while one or two features vary.
+
+    The body is ``{"base": {...}, "sweep": [{"field": ..., ...}]}``. The base
+    record takes the /api/predict defaults for fields it leaves out. Each sweep
+    spec gives ``values``, a numeric ``start``/``stop``/``steps`` range, or
+    nothing for a categorical field to cover its whole training vocabulary.
+    Returns the price curve for one sweep, or the price grid for two.
+    """
+
+    if predictor is None or encoder is None:
+        return {"error": "Model not loaded"}
+
+    try:
+        body = await request.json()
+        if not isinstance(body, dict) or not isinstance(body.get("base"), dict):
+            raise ValueError("Body must be a JSON object with a 'base' property record")
+        record_parse_time(request, "predict_sweep")
+        return await executor.run(score_sweep, body["base"], body.get("sweep"))
+
+    except InvalidInputError as e:
+        PREDICTION_ERRORS.inc("predict_sweep", "invalid")
+        return JSONResponse(status_code=422, content={"error": str(e), "fields": e.problems})
+    except QueueFullError:
+        PREDICTION_ERRORS.inc("predict_sweep", "busy")
+        return busy_response()
+    except Exception as e:
+        PREDICTION_ERRORS.inc("predict_sweep", "error")
+        return {"error": str(e)}
+
+def sweep_values(spec, state):
+    """The field and raw values one sweep spec asks for"""
+    field = spec.get("field")
+    if field in state.encoder.numeric_index:
+        if "values" in spec:
+            values = [float(value) for value in spec["values"]]
+        elif "start" in spec and "stop" in spec:
+            steps = int(spec.get("steps", SWEEP_DEFAULT_STEPS))
+            if not 1 <= steps <= SWEEP_MAX_VALUES:
+                raise ValueError(f"Sweep of {field} must take between 1 and {SWEEP_MAX_VALUES} steps")
+            values = np.linspace(float(spec["start"]), float(spec["stop"]), steps).tolist()
         else:
-            prediction = model.predict(df_encoded)[0]
-        
-        return {
-            "predicted_price": f"${prediction:,.2f}",
-            "predicted_price_raw": prediction,
-            "input_features": input_data
-        }
-        
+            raise ValueError(f"Sweep of {field} needs 'values' or 'start' and 'stop'")
+    elif field in state.encoder.category_index:
+        values = spec.get("values")
+        if values is None:
+            # The whole vocabulary, ordered as in the full-record schema
+            values = list(get_args(category_type(field, state.encoder.category_index[field])))
+    else:
+        raise ValueError(f"Cannot sweep unknown feature {field!r}")
+
+    if not 1 <= len(values) <= SWEEP_MAX_VALUES:
+        raise ValueError(f"Sweep of {field} must take between 1 and {SWEEP_MAX_VALUES} values")
+    return field, values
+
+def score_sweep(base, sweeps):
+    """Price a base record over the values (or grid of values) of one or two swept features.
+
+    The model is linear in its features, so changing one field moves the price
+    by that field's own contribution only. The base record is encoded and
+    scored once; each sweep is then one gather from the coefficients, and a
+    two-feature grid is the outer sum of the two price deltas.
+    """
+    state = serving
+    if not isinstance(sweeps, list) or not 1 <= len(sweeps) <= 2:
+        raise ValueError("'sweep' must list one or two features to vary")
+    if not all(isinstance(spec, dict) for spec in sweeps):
+        raise ValueError("Each sweep must be a JSON object with a 'field'")
+    sweeps = [sweep_values(spec, state) for spec in sweeps]
+    if len(sweeps) == 2 and sweeps[0][0] == sweeps[1][0]:
+        raise ValueError(f"Cannot sweep {sweeps[0][0]} twice")
+
+    # Fields without a default must be in the base record, as for the batch endpoint
+    missing = set(FEATURE_FIELDS) - set(DEFAULT_VALUES) - base.keys()
+    if missing:
+        raise ValueError(f"Base record is missing fields: {', '.join(sorted(missing))}")
+    base = with_defaults(base, state.encoder)
+    if validator is not None:
+        validator.check(base)
+
+    # The fused weights, whichever predictor is serving
+    linear = state.predictor if isinstance(state.predictor, LinearPredictor) else state.bundle.predictor()
+    base_price = linear.predict_sparse(*state.encoder.encode_sparse(base))
+
+    deltas = []
+    for field, values in sweeps:
+        columns, features = state.encoder.field_columns(field, values)
+        if field in state.encoder.category_index:
+            # None takes the fitted fill value, as a null in the base record does; fields
+            # without one encode it as no category, which is not an unknown value
+            unknown = [value for value, column in zip(values, columns) if column < 0 and value is not None]
+            if unknown:
+                raise InvalidInputError([{"field": field, "error": f"unknown categories {unknown!r}"}])
+        else:
+            # Log of a non-positive lot size, cube root of a negative area
+            outside = [value for value, x in zip(values, features) if not np.isfinite(x)]
+            if outside:
+                raise InvalidInputError([{"field": field, "error": f"values outside the model's domain {outside!r}"}])
+
+        contribution = np.where(columns >= 0, linear.coef[columns] * features, 0.0)
+        base_column, base_feature = state.encoder.field_columns(field, [base[field]])
+        base_contribution = linear.coef[base_column[0]] * base_feature[0] if base_column[0] >= 0 else 0.0
+        deltas.append(contribution - base_contribution)
+
+    prices = base_price + deltas[0]
+    if len(deltas) == 2:
+        prices = prices[:, None] + deltas[1][None, :]
+
+    return {
+        "model_version": state.version,
+        "base_price": base_price,
+        "fields": [field for field, _ in sweeps],
+        "values": [values for _, values in sweeps],
+        "predicted_prices": prices.tolist(),
+    }
+
+def interval_bounds(state, features, prediction, level):
+    """Lower and upper bounds of the ``level`` prediction interval around a single prediction.
+
+    ``features`` is the ``(indices, values)`` row ``state`` scored; one
+    (non-zeros x rank) product.
+    """
+    half_width = require_interval(state).half_width_sparse(*features, level)
+    return {"lower": prediction - half_width, "upper": prediction + half_width, "interval_level": level}
+
+def explain_record(state, features, k):
+    """The ``k`` fields that moved one prediction most, relative to the average training house.
+
+    The contributions of all fields add up to the prediction minus ``baseline_price``.
+    ``features`` is the ``(indices, values)`` row ``state`` scored; one
+    (non-zeros x fields) product.
+    """
+    attribution = state.attribution
+    contributions = attribution.contributions_sparse(*features)
+    fields, values = attribution.top(contributions, check_explain(k))
+    return {
+        "baseline_price": attribution.baseline,
+        "attributions": [{"field": f, "contribution": v} for f, v in zip(fields[0].tolist(), values[0].tolist())]
+    }
+
+def score_record(input_data, level=None, explain=None, endpoint="predict"):
+    """Encode one full property record and predict its price.
+
+    Returns (price, model version, details): ``details`` holds the interval
+    bounds at ``level`` and the ``explain`` top attributions, computed from
+    the same model and encoded row as the price. Returned as
+    ``(result, timings)``, with the stage times labelled by ``endpoint``
+    for the caller to record.
+    """
+    state = serving
+    timings = Timings()
+    # Encode straight into the training feature layout, then scale and predict
+    if SPARSE_INFERENCE:
+        with timings.time(endpoint, "encode"):
+            features = state.encoder.encode_sparse(input_data)
+        with timings.time(endpoint, "model"):
+            prediction = state.predictor.predict_sparse(*features)
+    else:
+        with timings.time(endpoint, "encode"):
+            features = state.encoder.encode(input_data).reshape(1, -1)
+        with timings.time(endpoint, "model"):
+            prediction = state.predictor.predict(features)[0]
+        if level is not None or explain is not None:
+            indices = np.flatnonzero(features[0])
+            features = (indices, features[0, indices])
+    prediction = float(prediction)
+
+    details = {}
+    if level is not None:
+        details.update(interval_bounds(state, features, prediction, level))
+    if explain is not None:
+        details.update(explain_record(state, features, explain))
+    return (prediction, state.version, details), timings
+
+def score_api_input(input_data):
+    """Score one defaulted /api/predict input with the single-record encoder, without a DataFrame"""
+    (prediction, version, _), timings = score_record(input_data, endpoint="api_predict")
+    return (prediction, version), timings
+
+def score_api_inputs(inputs):
+    """Score a list of defaulted /api/predict inputs in one pass.
+
+    Returns a (price, model version) pair per input, and the stage timings.
+    The DataFrame only pays off for several inputs; a lone one is scored
+    by ``score_api_input``.
+    """
+    import pandas as pd
+    
+    if len(inputs) == 1:
+        result, timings = score_api_input(inputs[0])
+        return [result], timings
+    
+    state = serving
+    timings = Timings()
+    with timings.time("api_predict", "dataframe"):
+        df = pd.DataFrame(inputs)
+    
+    # Encoded by the fitted pipeline, as in every other path
+    with timings.time("api_predict", "encode"):
+        features, valid = encode_frame(df, state)
+    with timings.time("api_predict", "model"):
+        # Rows that encode to non-finite features (e.g. log of a zero lot size) get NaN
+        predictions = np.full(len(df), np.nan)
+        if valid.any():
+            predictions[valid] = state.predictor.predict(features[valid])
+    return [(float(p), state.version) for p in predictions], timings
+
+def parse_records(body, content_type=""):
+    """Parse a JSON array or newline-delimited JSON body into a list of records"""
+    text = body.decode("utf-8").strip()
+    if not text:
+        return []
+
+    if "ndjson" in content_type or not text.startswith("["):
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        records = json.loads(text)
+
+    if not all(isinstance(record, dict) for record in records):
+        raise ValueError("Each property record must be a JSON object")
+    return records
+
+def with_defaults(record, encoder):
+    """Fill missing and null features: the pipeline's fill values first, then the /api/predict defaults"""
+    record = encoder.prepare(record)
+    return {**DEFAULT_VALUES, **{k: v for k, v in record.items() if v is not None}}
+
+def records_frame(records, encoder):
+    """Frame of defaulted raw records in FEATURE_FIELDS order"""
+    import pandas as pd
+
+    return pd.DataFrame([with_defaults(record, encoder) for record in records], columns=FEATURE_FIELDS)
+
+def predict_records(records, state=None, level=None, explain=None):
+    """Score raw property records, one encode and predict call per chunk"""
+    state = state or serving
+    return predict_frame(records_frame(records, state.encoder), state, level, explain)
+
+@app.post("/api/predict/batch")
+async def predict_batch_api(request: Request, interval: Optional[float] = None, explain: Optional[int] = None):
+    """Batch API endpoint: score a JSON array or NDJSON stream of property records.
+
+    Pass ``interval`` (e.g. 0.9) for the bounds of prediction intervals at that level,
+    and ``explain`` (e.g. 5) for the fields that moved each price most.
+    """
+
+    if predictor is None or encoder is None:
+        return {"error": "Model not loaded"}
+
+    try:
+        body = await request.body()
+        return await executor.run(score_batch, body, request.headers.get("content-type", ""), interval, explain)
+
+    except IntervalUnavailableError as e:
+        return interval_unavailable_response(e)
+    except QueueFullError:
+        return busy_response()
+    except Exception as e:
+        return {"error": str(e)}
+
+def check_records(records):
+    """Default and validate batch records.
+
+    Returns the defaulted records, the indices of the valid ones and the
+    rejected ones with their problems; a record missing a field that has no
+    default fails the whole batch.
+    """
+    # Fields without a default must be present in every record
+    required = set(FEATURE_FIELDS) - set(DEFAULT_VALUES)
+    for i, record in enumerate(records):
+        missing = required - record.keys()
+        if missing:
+            raise ValueError(f"Record {i} is missing fields: {', '.join(sorted(missing))}")
+
+    # Rejected records are reported by index and not scored; the rest of the batch still is
+    records = [with_defaults(record, serving.encoder) for record in records]
+    valid, rejected = [], []
+    for i, record in enumerate(records):
+        try:
+            if validator is not None:
+                validator.check(record)
+            valid.append(i)
+        except InvalidInputError as e:
+            rejected.append({"index": i, "error": str(e), "fields": e.problems})
+    return records, valid, rejected
+
+def score_batch(body, content_type, level=None, explain=None):
+    """Parse, validate and score a batch request body"""
+    records, valid, rejected = check_records(parse_records(body, content_type))
+
+    state = serving
+    predictions = np.full(len(records), np.nan)
+    half_widths = np.full(len(records), np.nan)
+    attributions = [None] * len(records)
+    if level is not None:
+        require_interval(state)
+    if valid:
+        scored = predict_records([records[i] for i in valid], state, level, explain)
+        if level is None and explain is None:
+            predictions[valid] = scored
+        else:
+            predictions[valid], widths, fields, contributions = scored
+            if level is not None:
+                half_widths[valid] = widths
+            if explain is not None:
+                for i, row_fields, row_values in zip(valid, fields.tolist(), contributions.tolist()):
+                    if row_fields[0] is not None:
+                        attributions[i] = [{"field": f, "contribution": v} for f, v in zip(row_fields, row_values)]
+
+    result = {
+        "model_version": state.version,
+        "count": len(predictions),
+        "invalid": int(np.isnan(predictions).sum()),
+        "rejected": rejected,
+        "predicted_prices_raw": [None if np.isnan(p) else p for p in predictions.tolist()]
+    }
+    if level is not None:
+        result["interval_level"] = level
+        result["lower_bounds"] = [None if np.isnan(p) else p for p in (predictions - half_widths).tolist()]
+        result["upper_bounds"] = [None if np.isnan(p) else p for p in (predictions + half_widths).tolist()]
+    if explain is not None:
+        result["baseline_price"] = state.attribution.baseline
+        result["attributions"] = attributions
+    return result
+
+@app.post("/api/comparables")
+async def comparables_api(request: Request, k: int = COMPARABLES_DEFAULT):
+    """Comparable-sales API endpoint: the ``k`` most similar sales in the training data.
+
+    Takes one property record, a JSON array or an NDJSON stream of them;
+    missing fields take the /api/predict defaults.
+    """
+
+    if predictor is None or encoder is None:
+        return {"error": "Model not loaded"}
+
+    try:
+        body = await request.body()
+        return await executor.run(find_comparables, body, request.headers.get("content-type", ""), k)
+
+    except QueueFullError:
+        return busy_response()
     except Exception as e:
         return {"error": str(e)}
 
+def find_comparables(body, content_type, k):
+    """Parse, validate and look up the comparable sales of a request body"""
+    records, valid, rejected = check_records(parse_records(body, content_type))
+    sales = [None] * len(records)
+    if valid:
+        for i, found in zip(valid, comparable_sales([records[i] for i in valid], k)):
+            sales[i] = found
+
+    return {
+        "model_version": serving.version,
+        "count": len(records),
+        "rejected": rejected,
+        "comparables": sales
+    }
+
+def comparable_sales(records, k):
+    """The ``k`` nearest training sales to each of a list of complete records"""
+    import pandas as pd
+
+    if not 1 <= k <= COMPARABLES_MAX:
+        raise ValueError(f"k must be between 1 and {COMPARABLES_MAX}, got {k}")
+    state = serving
+    index = state.comparables
+    if index is None:
+        raise ValueError("Comparable sales are unavailable: the training data was not found")
+    queries = state.encoder.encode_frame_sparse(pd.DataFrame(records, columns=FEATURE_FIELDS))
+    return index.sales(*index.query(queries, k))
+
+@app.get("/api/inference/stats")
+async def inference_stats():
+    """Inference pool counters: queue wait versus compute time, rejections"""
+    stats = executor.snapshot()
+    if batcher is not None:
+        stats["batching"] = dict(batcher.stats)
+    if prediction_cache is not None:
+        stats["prediction_cache"] = prediction_cache.snapshot()
+    if validator is not None:
+        stats["validation"] = validator.snapshot()
+    return stats
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Request, stage, pool and cache metrics in the Prometheus text format"""
+    MODEL_INFO.clear()
+    MODEL_INFO.set(1, model_version or "none")
+    for stat, value in executor.snapshot().items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            POOL_STATS.set(value, stat)
+    if batcher is not None:
+        for stat, value in batcher.stats.items():
+            POOL_STATS.set(value, f"batch_{stat}")
+    if prediction_cache is not None:
+        for stat, value in prediction_cache.snapshot().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                CACHE_STATS.set(value, stat)
+    VALIDATION_STATS.clear()
+    if validator is not None:
+        validation = validator.snapshot()
+        VALIDATION_STATS.set(validation["checked"], "all", "checked")
+        VALIDATION_STATS.set(validation["rejected"], "all", "rejected")
+        for field, counts in validation["fields"].items():
+            for kind, value in counts.items():
+                VALIDATION_STATS.set(value, field, kind)
+    return Response(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/admin/reload")
+async def reload_api(x_admin_token: str = Header(default="")):
+    """Load, validate and swap in new model artifacts without restarting"""
+    if not ADMIN_TOKEN:
+        return JSONResponse(status_code=404, content={"error": "Not found"})
+    if not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        return JSONResponse(status_code=403, content={"error": "Invalid admin token"})
+    
+    try:
+        return await reload_model()
+    except Exception as e:
+        return JSONResponse(
+            status_code=409,
+            content={"error": f"Reload failed, still serving {model_version}: {str(e)}"}
+        )
+
 def create_price_distribution_plot():
     """Create modern price distribution plot"""
-    # Sample price data with more realistic distribution
-    prices = np.random.normal(180000, 80000, 1000)
-    prices = np.clip(prices, 50000, 500000)
+    import plotly.graph_objects as go
+    
+    import pandas as pd
+    
+    # Actual sale prices from the training data
+    prices = pd.read_csv(DATA_PATH, usecols=["Sale_Price"])["Sale_Price"]
     
     fig = go.Figure()
     
@@ -454,17 +1236,23 @@ def create_price_distribution_plot():
         )
     )
     
-    return fig.to_html(full_html=False, include_plotlyjs=False)
+    return fig.to_html(full_html=False, include_plotlyjs=False, div_id="price-distribution-plot")
 
 def create_feature_importance_plot():
     """Create modern feature importance plot"""
-    features = ['Lot Size', 'Overall Quality', 'Year Built', 'Total Area', 'Garage Area', 
-                'Basement Area', 'Bathrooms', 'Bedrooms', 'Kitchen Quality', 'Foundation']
-    importance = [0.25, 0.22, 0.18, 0.15, 0.08, 0.06, 0.03, 0.02, 0.01, 0.01]
+    import plotly.graph_objects as go
+    
+    attribution = serving.attribution if serving is not None else None
+    if attribution is None:
+        return ""
     
-    # Create gradient colors based on importance
-    colors = [f'rgba({int(255 - imp * 1000)}, {int(100 + imp * 500)}, {int(50 + imp * 200)}, {0.7 + imp * 0.3})' 
-              for imp in importance]
+    # Global attribution: how far each field's contribution moves prices across
+    # the training houses, with all dummies of a categorical field taken together
+    spread = attribution.spread()
+    top = np.argsort(-spread)[:10][::-1]
+    features = [attribution.fields[i].replace('_', ' ') for i in top]
+    importance = spread[top]
+    colors = ['rgba(102, 126, 234, 0.85)'] * len(top)
     
     fig = go.Figure()
     
@@ -477,7 +1265,7 @@ def create_feature_importance_plot():
             color=colors,
             line=dict(color='rgba(255,255,255,0.8)', width=1)
         ),
-        hovertemplate='<b>%{y}</b><br><b>Importance:</b> %{x:.3f}<extra></extra>'
+        hovertemplate='<b>%{y}</b><br><b>Typical effect:</b> ±$%{x:,.0f}<extra></extra>'
     ))
     
     fig.update_layout(
@@ -488,12 +1276,11 @@ def create_feature_importance_plot():
             xanchor='center'
         ),
         xaxis=dict(
-            title=dict(text="Importance Score", font=dict(size=16, color='#4a5568')),
+            title=dict(text="Std. Dev. of Price Contribution ($)", font=dict(size=16, color='#4a5568')),
             gridcolor='rgba(0,0,0,0.1)',
             zerolinecolor='rgba(0,0,0,0.2)',
             showgrid=True,
-            gridwidth=1,
-            range=[0, 0.3]
+            gridwidth=1
         ),
         yaxis=dict(
             title=dict(text="Features", font=dict(size=16, color='#4a5568')),
@@ -515,29 +1302,66 @@ def create_feature_importance_plot():
     
 
     
-    return fig.to_html(full_html=False, include_plotlyjs=False)
+    return fig.to_html(full_html=False, include_plotlyjs=False, div_id="feature-importance-plot")
+
+def load_metrics():
+    """Model metrics written by train_model.py, or None before the first training run"""
+    if not os.path.exists(METRICS_PATH):
+        return None
+    with open(METRICS_PATH) as f:
+        return json.load(f)
 
-def create_model_comparison_plot():
+def create_model_comparison_plot(metrics=None):
     """Create modern model comparison plot"""
-    models = ['Linear Regression', 'Ridge Regression', 'Lasso Regression', 'Elastic Net']
-    r2_scores = [0.85, 0.878, 0.865, 0.836]
-    rmse_scores = [28000, 22886, 24097, 26528]
-    
-    # Create gradient colors based on performance
-    colors = ['#e53e3e', '#38a169', '#d69e2e', '#805ad5']  # Red, Green, Yellow, Purple
+    import plotly.graph_objects as go
     
     fig = go.Figure()
     
-    fig.add_trace(go.Bar(
-        name='R² Score',
-        x=models,
-        y=r2_scores,
-        marker=dict(
-            color=colors,
-            line=dict(color='rgba(255,255,255,0.8)', width=2)
-        ),
-        hovertemplate='<b>%{x}</b><br><b>R² Score:</b> %{y:.3f}<extra></extra>'
-    ))
+    if metrics:
+        results = metrics['models']
+        models = [result['model'] for result in results]
+        test_r2 = [result['test_r2'] for result in results]
+        details = [
+            f"{', '.join(f'{k}={v:g}' for k, v in result['params'].items()) or 'no parameters'}"
+            + (f"<br>RMSE: ${result['test_rmse']:,.0f}" if result.get('test_rmse') is not None else "")
+            for result in results
+        ]
+        
+        # Highlight the model train_model.py selected
+        colors = ['#38a169' if result['model'] == metrics['selected']['model'] else '#805ad5' for result in results]
+        
+        fig.add_trace(go.Bar(
+            name='Held-out R²',
+            x=models,
+            y=test_r2,
+            customdata=details,
+            marker=dict(
+                color=colors,
+                line=dict(color='rgba(255,255,255,0.8)', width=2)
+            ),
+            hovertemplate='<b>%{x}</b><br><b>Held-out R²:</b> %{y:.3f}<br>%{customdata}<extra></extra>'
+        ))
+        
+        cv_results = [result for result in results if result.get('cv_r2') is not None]
+        if cv_results:
+            fig.add_trace(go.Bar(
+                name=f"{metrics.get('cv_folds', '')}-fold CV R²",
+                x=[result['model'] for result in cv_results],
+                y=[result['cv_r2'] for result in cv_results],
+                error_y=dict(type='data', array=[result['cv_r2_std'] for result in cv_results]),
+                marker=dict(color='rgba(102, 126, 234, 0.6)'),
+                hovertemplate='<b>%{x}</b><br><b>CV R²:</b> %{y:.3f}<extra></extra>'
+            ))
+        
+        scores = test_r2 + [result['cv_r2'] for result in cv_results]
+        r2_range = [max(0.0, min(scores) - 0.05), min(1.0, max(scores) + 0.03)]
+    else:
+        r2_range = [0, 1]
+        fig.add_annotation(
+            text="No model metrics yet: run python train_model.py search",
+            showarrow=False, x=0.5, y=0.5, xref='paper', yref='paper',
+            font=dict(size=14, color='#4a5568')
+        )
     
     fig.update_layout(
         title=dict(
@@ -559,13 +1383,14 @@ def create_model_comparison_plot():
             zerolinecolor='rgba(0,0,0,0.2)',
             showgrid=True,
             gridwidth=1,
-            range=[0.8, 0.9]
+            range=r2_range
         ),
         plot_bgcolor='rgba(255,255,255,0.9)',
         paper_bgcolor='rgba(255,255,255,0.9)',
         font=dict(family='Inter', size=14, color='#2d3748'),
         margin=dict(l=60, r=60, t=80, b=80),
-        showlegend=False,
+        barmode='group',
+        showlegend=len(fig.data) > 1,
         hoverlabel=dict(
             bgcolor='rgba(255,255,255,0.95)',
             bordercolor='rgba(102, 126, 234, 0.5)',
@@ -575,7 +1400,8 @@ def create_model_comparison_plot():
     
 
     
-    return fig.to_html(full_html=False, include_plotlyjs=False)
+    return fig.to_html(full_html=False, include_plotlyjs=False, div_id="model-comparison-plot")
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -0,0 +1,662 @@
+import argparse
+import asyncio
+import json
+import statistics
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from preprocessing import FEATURE_FIELDS
+
+# Child-process snippets timing everything a fresh worker needs before it can score
+STARTUP_PATHS = {
+    "pickle": """
+import time
+start = time.perf_counter()
+import pickle
+with open("model.pkl", "rb") as f:
+    model = pickle.load(f)
+with open("scaler.pkl", "rb") as f:
+    scaler = pickle.load(f)
+with open("feature_columns.pkl", "rb") as f:
+    feature_columns = pickle.load(f)
+print(time.perf_counter() - start)
+""",
+    "bundle": """
+import time
+start = time.perf_counter()
+from inference import load_bundle
+bundle = load_bundle("model_bundle")
+predictor = bundle.predictor()
+feature_columns = bundle.feature_columns
+print(time.perf_counter() - start)
+""",
+}
+
+
+# Modules the serving path must not pull in at startup; they belong to the
+# batch, analytics and training code paths and are imported lazily there
+DEFERRED_MODULES = ["pandas", "scipy", "sklearn", "plotly"]
+
+# Worker startup: import the app and load the model, as the startup event does
+IMPORT_TARGET = "import app; app.load_model()"
+
+
+# Query parameters for a typical /api/predict call
+API_PARAMS = {
+    "building_class": 60, "lot_size": 8450, "overall_material": 7, "house_condition": 5,
+    "house_life": 20, "first_floor_area": 856, "grade_living_area": 1710, "garage_area": 548,
+    "neighborhood": "CollgCr", "house_type": "1Fam", "foundation_type": "PC",
+}
+
+# Form fields for a typical /predict submission (the first listing in the training data),
+# in FEATURE_FIELDS order
+PREDICT_FORM = {
+    "building_class": 60, "zoning_class": "RLD", "lot_extent": 65, "lot_size": 8450,
+    "lane_type": "No_Allay_Access", "property_shape": "Reg", "land_outline": "Lvl",
+    "lot_configuration": "I", "property_slope": "GS", "neighborhood": "CollgCr", "condition1": "Norm",
+    "house_type": "1Fam", "house_design": "2Story", "overall_material": 7, "house_condition": 5,
+    "house_life": 20, "roof_design": "Gable", "exterior1st": "VinylSd", "exterior2nd": "VinylSd",
+    "brick_veneer_type": "BrkFace", "brick_veneer_area": 196, "exterior_material": "Gd",
+    "exterior_condition": "TA", "foundation_type": "PC", "basement_height": "Gd",
+    "basement_condition": "TA", "exposure_level": "No", "bsmt_fin_type1": "GLQ", "bsmt_fin_sf1": 706,
+    "bsmt_fin_type2": "Unf", "bsmt_fin_sf2": 0, "bsmt_unf_sf": 150, "total_basement_area": 856,
+    "heating_quality": "Ex", "air_conditioning": "Y", "electrical_system": "SBrkr",
+    "first_floor_area": 856, "second_floor_area": 854, "grade_living_area": 1710,
+    "underground_full_bathroom": 1, "underground_half_bathroom": 0, "full_bathroom_above_grade": 2,
+    "half_bathroom_above_grade": 1, "bedroom_above_grade": 3, "kitchen_quality": "Gd",
+    "rooms_above_grade": 8, "functional_rate": "TF", "fireplaces": 0, "fireplace_quality": "No_Fireplace",
+    "garage": "Attchd", "garage_finish_year": "RFn", "garage_size": 2, "garage_area": 548,
+    "garage_quality": "TA", "garage_condition": "TA", "paved_drive": "Y", "w_deck_area": 0,
+    "open_lobby_area": 61, "enclosed_lobby_area": 0, "screen_lobby_area": 0,
+    "fence_quality": "No_Fence", "sale_type": "WD", "sale_condition": "Normal",
+}
+
+# The same listing as a complete /api/predict/full JSON record
+PREDICT_RECORD = dict(zip(FEATURE_FIELDS, PREDICT_FORM.values()))
+
+# Row counts for the batch scoring section of the suite
+SUITE_BATCH_SIZES = [1, 100, 10000, 1000000]
+
+# Relative change in the bad direction that counts as a regression
+REGRESSION_TOLERANCE = 0.2
+
+
+def run_child(code):
+    """Run a snippet in a fresh interpreter and return the time it prints"""
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", code],
+        capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def benchmark_startup(repeat):
+    """Compare cold-start artifact loading: three pickles vs the memory-mapped bundle"""
+    results = {}
+    for name, code in STARTUP_PATHS.items():
+        timings = [run_child(code) for _ in range(repeat)]
+        results[name] = statistics.median(timings)
+        print(f"{name:>8}: median {results[name] * 1000:8.1f} ms "
+              f"(min {min(timings) * 1000:.1f} ms, {repeat} runs)")
+
+    print(f"Speed-up: {results['pickle'] / results['bundle']:.1f}x")
+    return results
+
+
+def parse_importtime(stderr):
+    """Parse `python -X importtime` output into {module: (self_us, cumulative_us, depth)}"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def benchmark_imports(budget_ms, top):
+    """Profile worker import time and fail if it exceeds the budget or loads deferred modules"""
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-X", "importtime", "-c", IMPORT_TARGET],
+        capture_output=True, text=True, check=True
+    )
+    modules = parse_importtime(result.stderr)
+    total_ms = sum(self_us for self_us, _, _ in modules.values()) / 1000
+
+    print(f"Total import time: {total_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+    print("Slowest top-level imports:")
+    top_level = sorted(
+        ((cumulative, name) for name, (_, cumulative, depth) in modules.items() if depth == 1),
+        reverse=True
+    )
+    for cumulative, name in top_level[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if total_ms > budget_ms:
+        failures.append(f"import time {total_ms:.1f} ms exceeds budget of {budget_ms:.0f} ms")
+    loaded = [name for name in DEFERRED_MODULES if name in modules]
+    if loaded:
+        failures.append(f"deferred modules imported at startup: {', '.join(loaded)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return not failures
+
+
+def percentile(values, q):
+    """q-th percentile of a list of numbers (nearest rank)"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def send_api_predict(client, i):
+    # Vary the lot size so every request is a distinct property
+    return client.get("/api/predict", params={**API_PARAMS, "lot_size": API_PARAMS["lot_size"] + i})
+
+
+def send_predict_form(client, i):
+    return client.post("/predict", data={**PREDICT_FORM, "lot_size": PREDICT_FORM["lot_size"] + i})
+
+
+def send_predict_full(client, i):
+    return client.post("/api/predict/full", json={**PREDICT_RECORD, "Lot_Size": PREDICT_RECORD["Lot_Size"] + i})
+
+
+async def load_test(app_module, concurrency, total_requests, send=send_api_predict):
+    """Fire requests from `concurrency` in-process clients; return latencies and wall time"""
+    import httpx
+
+    await app_module.startup_event()
+    latencies = []
+    counter = iter(range(total_requests))
+
+    async def client_loop(client):
+        for i in counter:
+            start = time.perf_counter()
+            response = await send(client, i)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+
+    await app_module.shutdown_event()
+    return latencies, wall
+
+
+def benchmark_batching(concurrency, total_requests, max_latency_ms, max_batch):
+    """Throughput and tail latency of /api/predict with and without micro-batching"""
+    import app as app_module
+
+    app_module.API_BATCH_MAX_LATENCY_MS = max_latency_ms
+    app_module.API_BATCH_MAX_SIZE = max_batch
+    app_module.INFERENCE_MAX_QUEUE = max(app_module.INFERENCE_MAX_QUEUE, concurrency)
+
+    results = {}
+    for mode, enabled in (("per-request", False), ("micro-batched", True)):
+        app_module.API_BATCHING = enabled
+        app_module.batcher = None
+        latencies, wall = asyncio.run(load_test(app_module, concurrency, total_requests))
+        results[mode] = {
+            "throughput_rps": total_requests / wall,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+        }
+        r = results[mode]
+        print(f"{mode:>14}: {r['throughput_rps']:8.1f} req/s  p50 {r['p50_ms']:7.1f} ms  "
+              f"p95 {r['p95_ms']:7.1f} ms  p99 {r['p99_ms']:7.1f} ms")
+
+    return results
+
+
+def benchmark_payloads(total_requests):
+    """Parse and render cost of the full-record JSON API versus the HTML form, one request at a time"""
+    import app as app_module
+
+    for name, endpoint, send in (("form -> HTML", "predict", send_predict_form),
+                                 ("JSON -> JSON", "predict_full", send_predict_full)):
+        latencies, _ = asyncio.run(load_test(app_module, 1, total_requests, send))
+        parse_count, parse_seconds = app_module.STAGE_LATENCY.totals(endpoint, "parse")
+        render_count, render_seconds = app_module.STAGE_LATENCY.totals(endpoint, "render")
+        print(f"{name:>13}: p50 {percentile(latencies, 50) * 1000:6.2f} ms  "
+              f"parse {parse_seconds / parse_count * 1e6:7.0f} us  "
+              f"render {render_seconds / render_count * 1e6:7.0f} us")
+
+
+def make_synthetic_data(path, scale, seed=0):
+    """Write a training CSV `scale` times the size of the shipped one by resampling its rows"""
+    import numpy as np
+    import pandas as pd
+
+    df = pd.read_csv("Property_Price_Train.csv")
+    rng = np.random.default_rng(seed)
+    synthetic = df.iloc[rng.integers(0, len(df), len(df) * scale)].reset_index(drop=True)
+    synthetic["Id"] = np.arange(1, len(synthetic) + 1)
+    # Jitter prices so the rows are not exact duplicates
+    synthetic["Sale_Price"] = (synthetic["Sale_Price"] * rng.normal(1, 0.05, len(synthetic))).round()
+    synthetic.to_csv(path, index=False)
+    return len(synthetic)
+
+
+def legacy_impute(df):
+    """The column-by-column imputation loop train_model.py used to run"""
+    for col in df.columns:
+        if df[col].dtypes == 'int64' or df[col].dtypes == 'float64':
+            df[col].fillna(df[col].mean(), inplace=True)
+        else:
+            df[col].fillna(df[col].value_counts().index[0], inplace=True)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def benchmark_training(scale):
+    """Stage timings of train_model.py on synthetic data: cold run versus cached rerun"""
+    import pandas as pd
+    import train_model
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = os.path.join(tmp, "train.csv")
+        cache_dir = os.path.join(tmp, "cache")
+        n_rows = make_synthetic_data(data_path, scale)
+        print(f"Synthetic data: {n_rows} rows ({os.path.getsize(data_path) / 1e6:.0f} MB)")
+
+        data_key = train_model.file_key(data_path)
+        timings = {}
+        _, timings["read_csv"] = timed(pd.read_csv, data_path)
+        df, timings["parse + write columnar cache"] = timed(train_model.load_data, data_path, cache_dir)
+        _, timings["columnar cache load"] = timed(train_model.load_data, data_path, cache_dir)
+
+        cleaned = train_model.clean_data(df)
+        _, timings["imputation, legacy loop"] = timed(legacy_impute, cleaned.copy())
+        _, timings["imputation, vectorized"] = timed(
+            lambda d: train_model.impute(d, train_model.fit_imputation(d)), cleaned.copy()
+        )
+
+        (X, y, encodings), timings["preprocess + write feature cache"] = timed(
+            train_model.build_features, df, data_key, cache_dir
+        )
+        (X, y, encodings), timings["feature cache load"] = timed(
+            train_model.build_features, None, data_key, cache_dir
+        )
+        _, timings["fit"] = timed(train_model.fit_model, X, y, encodings["feature_columns"])
+
+    for stage, seconds in timings.items():
+        print(f"  {stage:>34}: {seconds:7.2f} s")
+
+    cold = timings["read_csv"] + timings["preprocess + write feature cache"] + timings["fit"]
+    warm = timings["feature cache load"] + timings["fit"]
+    print(f"Cold run {cold:.2f} s, rerun on unchanged data {warm:.2f} s ({cold / warm:.1f}x)")
+    return timings
+
+
+# Child snippet: train on a CSV and print the peak resident set size in MB.
+# VmHWM is reset by exec; ru_maxrss is not, so on Linux it would report the
+# parent's peak whenever the parent is the bigger process
+TRAINING_MEMORY_CHILD = """
+import resource, sys, tempfile, train_model
+with tempfile.TemporaryDirectory() as out:
+    train_model.train_and_save_model(sys.argv[1], None, out, streaming=sys.argv[2] == "1")
+try:
+    with open("/proc/self/status") as f:
+        print(next(int(line.split()[1]) for line in f if line.startswith("VmHWM")) / 1024)
+except OSError:
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+"""
+
+
+def benchmark_streaming(scales):
+    """Peak memory and wall time of in-memory versus streaming training as the data grows"""
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            data_path = os.path.join(tmp, f"train-{scale}.csv")
+            n_rows = make_synthetic_data(data_path, scale)
+            for mode, streaming in (("in-memory", "0"), ("streaming", "1")):
+                start = time.perf_counter()
+                result = subprocess.run(
+                    [sys.executable, "-W", "ignore", "-c", TRAINING_MEMORY_CHILD, data_path, streaming],
+                    capture_output=True, text=True, check=True
+                )
+                elapsed = time.perf_counter() - start
+                peak_mb = float(result.stdout.strip().splitlines()[-1])
+                print(f"{n_rows:>9} rows {mode:>10}: peak RSS {peak_mb:7.0f} MB, {elapsed:6.1f} s")
+
+
+def legacy_prepare_features(df):
+    """The object-dtype and get_dummies encoding train_model.py used to run, as a dense matrix"""
+    import numpy as np
+    import pandas as pd
+    import train_model
+    from preprocessing import CLIPPED_FEATURES, CUBE_ROOT_FEATURES, DISCRETE_COLS, LOG_FEATURES
+    from scipy import stats
+
+    df = train_model.clean_data(df)
+    df = train_model.impute(df, train_model.fit_imputation(df))
+    df[DISCRETE_COLS] = df[DISCRETE_COLS].astype('object')
+    df = df.drop(columns=[col for col in train_model.QUASI_CONSTANT_FEATURES if col in df.columns])
+    df = df[np.abs(stats.zscore(df['Sale_Price'])) <= train_model.OUTLIER_Z_THRESHOLD]
+    df_num = df.select_dtypes(include=['int64', 'float64']).drop(columns='Sale_Price')
+    df_fac = df.select_dtypes(include=['object'])
+    df_combined = pd.concat([df_num, df_fac], axis=1)
+    df_combined[LOG_FEATURES] = np.log(df_combined[LOG_FEATURES])
+    df_combined[CUBE_ROOT_FEATURES] = df_combined[CUBE_ROOT_FEATURES] ** (1/3)
+    df_combined[CLIPPED_FEATURES] = df_combined[CLIPPED_FEATURES].clip(lower=0)
+    df_encoded = pd.get_dummies(df_combined, drop_first=False)
+    return df_encoded.to_numpy(dtype=float), df['Sale_Price']
+
+
+# Child snippet: encode a training CSV one way and print the peak RSS in MB,
+# the encoding time and the matrix checksum (see TRAINING_MEMORY_CHILD)
+ENCODING_MEMORY_CHILD = """
+import resource, sys, time, pandas as pd, benchmark, train_model
+df = pd.read_csv(sys.argv[1])
+start = time.perf_counter()
+X = (benchmark.legacy_prepare_features if sys.argv[2] == "legacy" else train_model.prepare_features)(df)[0]
+elapsed = time.perf_counter() - start
+try:
+    with open("/proc/self/status") as f:
+        peak = next(int(line.split()[1]) for line in f if line.startswith("VmHWM")) / 1024
+except OSError:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(peak, elapsed, float(X.sum()))
+"""
+
+
+def benchmark_categorical(scales):
+    """Peak memory and time of the legacy get_dummies encoding versus category codes"""
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            data_path = os.path.join(tmp, f"train-{scale}.csv")
+            n_rows = make_synthetic_data(data_path, scale)
+            checksums = set()
+            for mode in ("legacy", "codes"):
+                result = subprocess.run(
+                    [sys.executable, "-W", "ignore", "-c", ENCODING_MEMORY_CHILD, data_path, mode],
+                    capture_output=True, text=True, check=True
+                )
+                peak_mb, seconds, checksum = map(float, result.stdout.strip().splitlines()[-1].split())
+                checksums.add(round(checksum, 3))
+                print(f"{n_rows:>9} rows {mode:>7}: peak RSS {peak_mb:7.0f} MB, encode {seconds:6.2f} s")
+            if len(checksums) > 1:
+                print("  feature matrices differ!")
+
+
+def benchmark_comparables(sizes, queries, k):
+    """Build time, memory and query latency of the comparable-sales index on resampled training sets"""
+    import numpy as np
+    from scipy import sparse
+
+    import app as app_module
+    from comparables import ComparablesIndex
+
+    app_module.load_model()
+    state = app_module.serving
+    rng = np.random.default_rng(0)
+
+    def encode(rows):
+        features, reasons = state.encoder.prepare_frame(rows)
+        X = state.encoder.encode_frame_sparse(features)
+        return X[(reasons == "").to_numpy() & np.isfinite(np.asarray(X.sum(axis=1)).ravel())]
+
+    query_rows = encode(sample_rows(queries, seed=1))
+    for n_rows in sizes:
+        # Jitter the continuous fields so resampled sales are not exact duplicates
+        blocks = []
+        for start in range(0, n_rows, 100000):
+            rows = sample_rows(min(100000, n_rows - start), seed=start + 1)
+            for field in state.encoder.numeric_index:
+                if field in rows.columns:
+                    rows[field] = rows[field] * rng.normal(1, 0.05, len(rows))
+            blocks.append(encode(rows))
+        X = sparse.vstack(blocks, format="csr")
+
+        index, build_seconds = timed(
+            ComparablesIndex, X, np.zeros(X.shape[0]), np.arange(X.shape[0]), state.bundle.arrays["mean"],
+            state.bundle.arrays["scale"], list(state.encoder.numeric_index.values())
+        )
+        single = [timed(index.query, query_rows[i], k)[1] for i in range(min(200, query_rows.shape[0]))]
+        _, batch_seconds = timed(index.query, query_rows, k)
+        print(f"{X.shape[0]:>9} sales: build {build_seconds:6.2f} s  index {index.nbytes / 1e6:7.1f} MB  "
+              f"single query p50 {percentile(single, 50) * 1e3:8.3f} ms  "
+              f"batch of {query_rows.shape[0]} {batch_seconds / query_rows.shape[0] * 1e3:8.3f} ms/query")
+
+
+def metric(value, unit, better="lower"):
+    return {"value": value, "unit": unit, "better": better}
+
+
+def sample_rows(n_rows, seed=0):
+    """`n_rows` listings resampled from the shipped training CSV"""
+    import numpy as np
+    import pandas as pd
+
+    df = pd.read_csv("Property_Price_Train.csv")
+    rng = np.random.default_rng(seed)
+    return df.iloc[rng.integers(0, len(df), n_rows)].reset_index(drop=True)
+
+
+def suite_single_row(app_module, n_rows):
+    """Per-record encode + predict, the work predict_price hands to the inference pool"""
+    features, reasons = app_module.encoder.prepare_frame(sample_rows(n_rows))
+    records = [
+        {k: v.item() if hasattr(v, "item") else v for k, v in record.items()}
+        for record in features[(reasons == "").to_numpy()].to_dict("records")
+    ]
+
+    latencies = []
+    for record in records:
+        start = time.perf_counter()
+        app_module.score_record(record)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "single_row.p50_us": metric(percentile(latencies, 50) * 1e6, "us"),
+        "single_row.p99_us": metric(percentile(latencies, 99) * 1e6, "us"),
+        "single_row.rows_per_s": metric(len(latencies) / sum(latencies), "rows/s", "higher"),
+    }
+
+
+def suite_batch(app_module, sizes):
+    """Bulk scoring (score.py's per-chunk work: prepare, encode, predict) at each row count"""
+    import score
+
+    score.state = app_module.serving
+    results = {}
+    for n_rows in sizes:
+        chunk = sample_rows(n_rows)
+        # Repeat small batches so their timings are not dominated by noise
+        repeat = max(1, min(50, 100000 // n_rows))
+        seconds = statistics.median(timed(score.score_chunk, chunk)[1] for _ in range(repeat))
+        results[f"batch.{n_rows}.seconds"] = metric(seconds, "s")
+        results[f"batch.{n_rows}.rows_per_s"] = metric(n_rows / seconds, "rows/s", "higher")
+        print(f"  batch {n_rows:>9} rows: {seconds * 1000:10.1f} ms ({n_rows / seconds:,.0f} rows/s)")
+    return results
+
+
+def suite_http(app_module, concurrency, total_requests):
+    """End-to-end latency and throughput of the prediction endpoints through the ASGI app"""
+    results = {}
+    for name, send in (("api_predict", send_api_predict), ("predict_form", send_predict_form),
+                       ("predict_full", send_predict_full)):
+        latencies, wall = asyncio.run(load_test(app_module, concurrency, total_requests, send))
+        results[f"http.{name}.throughput_rps"] = metric(total_requests / wall, "req/s", "higher")
+        for q in (50, 95, 99):
+            results[f"http.{name}.p{q}_ms"] = metric(percentile(latencies, q) * 1000, "ms")
+    return results
+
+
+def suite_training():
+    """Wall time and peak RSS of a full train_model.py run on the shipped CSV, in a fresh process"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", TRAINING_MEMORY_CHILD, "Property_Price_Train.csv", "0"],
+        capture_output=True, text=True, check=True
+    )
+    return {
+        "training.wall_s": metric(time.perf_counter() - start, "s"),
+        "training.peak_rss_mb": metric(float(result.stdout.strip().splitlines()[-1]), "MB"),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_suite(output, sizes, rows, concurrency, total_requests, training):
+    """Run every section of the suite and write the results as JSON"""
+    import app as app_module
+
+    app_module.load_model()
+    results = {}
+    print("Single-row encode + predict...")
+    results.update(suite_single_row(app_module, rows))
+    print("Batch scoring...")
+    results.update(suite_batch(app_module, sizes))
+    print("HTTP load test...")
+    results.update(suite_http(app_module, concurrency, total_requests))
+    if training:
+        print("Training run...")
+        results.update(suite_training())
+
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "metrics": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, m in results.items():
+        print(f"  {name:>32}: {m['value']:12.2f} {m['unit']}")
+    print(f"Results written to {output}")
+    return report
+
+
+def compare_results(baseline, current, tolerance):
+    """Print every shared metric's change and return the ones that got worse by more than `tolerance`"""
+    print(f"Baseline {baseline.get('commit')} -> current {current.get('commit')} "
+          f"(tolerance {tolerance:.0%})")
+    regressions = []
+    for name, m in current["metrics"].items():
+        old = baseline["metrics"].get(name)
+        if old is None or not old["value"]:
+            continue
+        change = (m["value"] - old["value"]) / old["value"]
+        worse = change if m["better"] == "lower" else -change
+        flag = ""
+        if worse > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"  {name:>32}: {old['value']:12.2f} -> {m['value']:12.2f} {m['unit']:<7} {change:+7.1%}{flag}")
+
+    if regressions:
+        print(f"FAIL: {len(regressions)} metric(s) regressed by more than {tolerance:.0%}")
+    return regressions
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance benchmarks for the house price app")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    startup = subparsers.add_parser("startup", help="cold-start model loading time")
+    startup.add_argument("--repeat", type=int, default=5)
+
+    imports = subparsers.add_parser("imports", help="worker import time against a regression budget")
+    imports.add_argument("--budget-ms", type=float, default=1000.0)
+    imports.add_argument("--top", type=int, default=10)
+
+    batching = subparsers.add_parser("batching", help="/api/predict load test with and without micro-batching")
+    batching.add_argument("--concurrency", type=int, default=64)
+    batching.add_argument("--requests", type=int, default=2000)
+    batching.add_argument("--max-latency-ms", type=float, default=2.0)
+    batching.add_argument("--max-batch", type=int, default=64)
+
+    payloads = subparsers.add_parser("payloads", help="parse/render cost of /api/predict/full versus the /predict form")
+    payloads.add_argument("--requests", type=int, default=1000)
+
+    comparables = subparsers.add_parser("comparables", help="comparable-sales index build and query time by size")
+    comparables.add_argument("--sizes", type=int, nargs="+", default=[1460, 10000, 100000, 1000000])
+    comparables.add_argument("--queries", type=int, default=1000)
+    comparables.add_argument("-k", type=int, default=10)
+
+    training = subparsers.add_parser("training", help="train_model.py stage timings on synthetic data")
+    training.add_argument("--scale", type=int, default=100, help="multiple of the shipped CSV's row count")
+
+    streaming = subparsers.add_parser("streaming", help="peak memory of in-memory versus streaming training")
+    streaming.add_argument("--scales", type=int, nargs="+", default=[10, 50, 100])
+
+    categorical = subparsers.add_parser("categorical", help="training feature encoding: get_dummies versus category codes")
+    categorical.add_argument("--scales", type=int, nargs="+", default=[10, 50, 100])
+
+    suite = subparsers.add_parser("suite", help="serving and training benchmarks written as JSON")
+    suite.add_argument("--output", default="benchmark_results.json")
+    suite.add_argument("--baseline", help="results JSON from an earlier commit to check for regressions")
+    suite.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    suite.add_argument("--batch-sizes", type=int, nargs="+", default=SUITE_BATCH_SIZES)
+    suite.add_argument("--rows", type=int, default=2000, help="listings for the single-row benchmark")
+    suite.add_argument("--concurrency", type=int, default=16)
+    suite.add_argument("--requests", type=int, default=500)
+    suite.add_argument("--skip-training", action="store_true")
+
+    compare = subparsers.add_parser("compare", help="check a suite results file against a baseline")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+
+    args = parser.parse_args()
+
+    if args.command == "startup":
+        benchmark_startup(args.repeat)
+    elif args.command == "imports":
+        if not benchmark_imports(args.budget_ms, args.top):
+            sys.exit(1)
+    elif args.command == "batching":
+        benchmark_batching(args.concurrency, args.requests, args.max_latency_ms, args.max_batch)
+    elif args.command == "payloads":
+        benchmark_payloads(args.requests)
+    elif args.command == "comparables":
+        benchmark_comparables(args.sizes, args.queries, args.k)
+    elif args.command == "training":
+        benchmark_training(args.scale)
+    elif args.command == "streaming":
+        benchmark_streaming(args.scales)
+    elif args.command == "categorical":
+        benchmark_categorical(args.scales)
+    elif args.command == "suite":
+        report = benchmark_suite(args.output, args.batch_sizes, args.rows, args.concurrency,
+                                 args.requests, not args.skip_training)
+        if args.baseline and compare_results(load_results(args.baseline), report, args.tolerance):
+            sys.exit(1)
+    elif args.command == "compare":
+        if compare_results(load_results(args.baseline), load_results(args.current), args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def prediction_key(input_data, model_version):
+    """Stable hash of a fully defaulted input record and the model that scores it"""
+    payload = json.dumps(input_data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{model_version}:{payload}".encode()).hexdigest()
+
+
+class SqliteStore:
+    """Prediction store in a local SQLite file, shared by every worker on the host.
+
+    Entries carry their insertion time so TTL expiry works across processes;
+    the table is trimmed back to ``max_size`` rows, oldest first.
+    """
+
+    def __init__(self, path, max_size=100000):
+        self.path = path
+        self.max_size = max_size
+        self._conn = sqlite3.connect(path, timeout=1.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions (key TEXT PRIMARY KEY, value REAL, created REAL)"
+        )
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key, ttl=None):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM predictions WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (ttl and time.time() - row[1] > ttl):
+            return None
+        return row[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)", (key, value, time.time())
+            )
+            # Trim occasionally rather than on every write
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                self._conn.execute(
+                    "DELETE FROM predictions WHERE key IN (SELECT key FROM predictions "
+                    "ORDER BY created DESC LIMIT -1 OFFSET ?)", (self.max_size,)
+                )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM predictions")
+
+
+class PredictionCache:
+    """Bounded LRU cache of predictions with optional TTL and shared backing store.
+
+    Keys come from ``prediction_key``, so entries for one model version are
+    never served for another; ``clear`` additionally drops them from memory
+    when new artifacts are loaded. Local misses fall through to ``store``
+    (e.g. ``SqliteStore``) when one is given, so uvicorn workers share hits.
+    """
+
+    def __init__(self, max_size=10000, ttl=None, store=None):
+        self.max_size = max_size
+        self.ttl = ttl or None
+        self.store = store
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key):
+        """Cached prediction for ``key``, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created = entry
+                if self.ttl and time.monotonic() - created > self.ttl:
+                    del self._entries[key]
+                    self.stats["expirations"] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return value
+
+        if self.store is not None:
+            value = self.store.get(key, self.ttl)
+            if value is not None:
+                self._insert(key, value)
+                with self._lock:
+                    self.stats["shared_hits"] += 1
+                return value
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def set(self, key, value):
+        """Remember a prediction, evicting the least recently used entries"""
+        self._insert(key, value)
+        if self.store is not None:
+            self.store.set(key, value)
+
+    def _insert(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        """Drop every in-memory entry (the shared store is keyed by model version)"""
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self):
+        """Counters plus current size and configuration"""
+        with self._lock:
+            return {
+                **self.stats,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "shared": self.store is not None,
+            }
@@ -0,0 +1,144 @@
+import sys
+
+import numpy as np
+
+# Training rows scored against a query batch at a time; bounds the
+# (rows x queries) distance block to a few MB
+BLOCK_SIZE = 65536
+
+
+class ComparablesIndex:
+    """Nearest historical sales by Euclidean distance on the standardized design matrix.
+
+    Each sale is stored as its standardized numeric columns (a dense float32
+    block, centered so that float32 keeps the distances accurate) and its
+    scaled one-hot columns (a CSR matrix with one entry per categorical
+    field; the mean of a dummy cancels out of any distance, so they stay
+    sparse). The search is blocked brute force: ``|x|^2 + |q|^2 - 2 x.q``
+    for a block of sales at a time against the whole query batch, keeping
+    the k nearest per query.
+    """
+
+    def __init__(self, X, prices, ids, mean, scale, numeric_columns, block_size=BLOCK_SIZE):
+        from scipy import sparse
+
+        X = sparse.csr_matrix(X)
+        numeric = np.asarray(numeric_columns, dtype=np.intp)
+        self.numeric_columns = numeric
+        self.categorical_columns = np.setdiff1d(np.arange(X.shape[1]), numeric)
+        self.shift = np.asarray(mean, dtype=np.float64)[numeric]
+        self.inv_scale = 1 / np.asarray(scale, dtype=np.float64)
+
+        self.numeric_points = self._numeric(X[:, numeric].toarray())
+        self.categorical_points = X[:, self.categorical_columns].multiply(
+            self.inv_scale[self.categorical_columns]
+        ).tocsr().astype(np.float32)
+        # Drop the explicit zeros of missing categories
+        self.categorical_points.eliminate_zeros()
+        self.norms = (
+            np.einsum('ij,ij->i', self.numeric_points, self.numeric_points)
+            + np.asarray(self.categorical_points.power(2).sum(axis=1)).ravel()
+        ).astype(np.float32)
+
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.ids = np.asarray(ids)
+
+        # Sliced once here rather than per query
+        self.blocks = [
+            (start, self.numeric_points[start:start + block_size],
+             self.categorical_points[start:start + block_size], self.norms[start:start + block_size])
+            for start in range(0, len(self.norms), block_size)
+        ]
+
+    def _numeric(self, values):
+        return ((values - self.shift) * self.inv_scale[self.numeric_columns]).astype(np.float32)
+
+    def __len__(self):
+        return len(self.norms)
+
+    @property
+    def nbytes(self):
+        categorical = self.categorical_points
+        return (self.numeric_points.nbytes + categorical.data.nbytes + categorical.indices.nbytes
+                + categorical.indptr.nbytes + self.norms.nbytes)
+
+    def query(self, Q, k):
+        """Row positions and distances of the ``k`` nearest sales to each row of a feature matrix.
+
+        Returns two (queries x k) arrays ordered nearest first.
+        """
+        Q = Q.toarray() if _issparse(Q) else np.atleast_2d(np.asarray(Q, dtype=np.float64))
+        numeric = self._numeric(Q[:, self.numeric_columns])
+        categorical = (Q[:, self.categorical_columns] * self.inv_scale[self.categorical_columns]).astype(np.float32)
+        q_norms = np.einsum('ij,ij->i', numeric, numeric) + np.einsum('ij,ij->i', categorical, categorical)
+        k = min(k, len(self))
+
+        best_distances = np.empty((len(Q), 0), dtype=np.float32)
+        best_rows = np.empty((len(Q), 0), dtype=np.intp)
+        for start, numeric_block, categorical_block, norms in self.blocks:
+            distances = numeric @ numeric_block.T
+            distances += np.asarray(categorical_block @ categorical.T).T
+            distances *= -2
+            distances += norms
+            distances += q_norms[:, None]
+
+            # Candidates of this block, merged with the best so far
+            if distances.shape[1] > k:
+                rows = np.argpartition(distances, k - 1, axis=1)[:, :k]
+                distances = np.take_along_axis(distances, rows, axis=1)
+            else:
+                rows = np.broadcast_to(np.arange(distances.shape[1]), distances.shape)
+            best_distances = np.concatenate([best_distances, distances], axis=1)
+            best_rows = np.concatenate([best_rows, rows + start], axis=1)
+            if best_distances.shape[1] > k:
+                keep = np.argpartition(best_distances, k - 1, axis=1)[:, :k]
+                best_distances = np.take_along_axis(best_distances, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        order = np.argsort(best_distances, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        # Rounding can leave tiny negative squared distances for identical rows
+        best_distances = np.sqrt(np.maximum(np.take_along_axis(best_distances, order, axis=1), 0))
+        return best_rows, best_distances.astype(np.float64)
+
+    def sales(self, rows, distances):
+        """The sales behind ``query`` results, one list of {Id, Sale_Price, distance} per query"""
+        return [
+            [{"Id": sale_id, "Sale_Price": price, "distance": distance}
+             for sale_id, price, distance in zip(ids, prices, dists)]
+            for ids, prices, dists in zip(self.ids[rows].tolist(), self.prices[rows].tolist(), distances.tolist())
+        ]
+
+
+def _issparse(X):
+    # A sparse matrix can only exist if scipy.sparse is already loaded
+    sparse = sys.modules.get("scipy.sparse")
+    return sparse is not None and sparse.issparse(X)
+
+
+def build_index(state, data_path, chunksize=50000):
+    """Index the sales in the training CSV with a loaded model's encoder and scaler.
+
+    Rows are prepared by ``encoder.prepare_frame``, as score.py prepares them;
+    rows it rejects, and rows that encode to non-finite features, are left out.
+    """
+    import pandas as pd
+    from scipy import sparse
+
+    blocks, prices, ids = [], [], []
+    offset = 0
+    for chunk in pd.read_csv(data_path, chunksize=chunksize):
+        features, reasons = state.encoder.prepare_frame(chunk)
+        X = state.encoder.encode_frame_sparse(features)
+        price = pd.to_numeric(chunk['Sale_Price'], errors='coerce').to_numpy(dtype=np.float64)
+        ok = (reasons == "").to_numpy() & np.isfinite(np.asarray(X.sum(axis=1)).ravel()) & np.isfinite(price)
+        blocks.append(X[ok])
+        prices.append(price[ok])
+        # Sales are identified by their Id, or by their row number in files without one
+        ids.append(chunk['Id'].to_numpy()[ok] if 'Id' in chunk.columns else np.flatnonzero(ok) + offset)
+        offset += len(chunk)
+
+    return ComparablesIndex(
+        sparse.vstack(blocks, format='csr'), np.concatenate(prices), np.concatenate(ids),
+        state.bundle.arrays['mean'], state.bundle.arrays['scale'], list(state.encoder.numeric_index.values())
+    )
@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    """Raised when the inference queue is at its depth limit"""
+
+
+def _timed_call(fn, args, submitted_at):
+    # perf_counter is CLOCK_MONOTONIC on Linux, so timestamps taken in pool
+    # processes are comparable with the submitting process
+    started_at = time.perf_counter()
+    result = fn(*args)
+    return result, started_at - submitted_at, time.perf_counter() - started_at
+
+
+class InferenceExecutor:
+    """Bounded pool that runs CPU-bound inference work off the event loop.
+
+    ``kind`` is "thread", "process" or "inline" (run on the calling thread, as
+    before). At most ``workers + max_queue`` calls may be in flight; further
+    calls fail fast with ``QueueFullError`` instead of queueing without bound.
+    Queue wait and compute time are accumulated separately in ``stats``.
+    """
+
+    def __init__(self, kind="thread", workers=4, max_queue=64, initializer=None):
+        if kind not in ("thread", "process", "inline"):
+            raise ValueError(f"Unknown executor kind {kind!r}")
+
+        self.kind = kind
+        self.workers = workers
+        self.max_in_flight = workers + max_queue
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            "submitted": 0,
+            "rejected": 0,
+            "completed": 0,
+            "failed": 0,
+            "queue_wait_seconds": 0.0,
+            "compute_seconds": 0.0,
+        }
+
+        if kind == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        elif kind == "process":
+            self._pool = ProcessPoolExecutor(max_workers=workers, initializer=initializer)
+        else:
+            self._pool = None
+
+    async def run(self, fn, *args):
+        """Run ``fn(*args)`` in the pool and return its result"""
+        with self._lock:
+            if self._in_flight >= self.max_in_flight:
+                self.stats["rejected"] += 1
+                raise QueueFullError(f"{self._in_flight} inference calls already in flight")
+            self._in_flight += 1
+            self.stats["submitted"] += 1
+
+        try:
+            submitted_at = time.perf_counter()
+            if self._pool is None:
+                result, queue_wait, compute = _timed_call(fn, args, submitted_at)
+            else:
+                future = self._pool.submit(_timed_call, fn, args, submitted_at)
+                result, queue_wait, compute = await asyncio.wrap_future(future)
+        except Exception:
+            with self._lock:
+                self.stats["failed"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        with self._lock:
+            self.stats["completed"] += 1
+            self.stats["queue_wait_seconds"] += queue_wait
+            self.stats["compute_seconds"] += compute
+        return result
+
+    def snapshot(self):
+        """Current counters plus pool configuration"""
+        with self._lock:
+            return {
+                **self.stats,
+                "kind": self.kind,
+                "workers": self.workers,
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+            }
+
+    def shutdown(self, wait=False):
+        """Stop the pool; with ``wait`` queued calls are allowed to finish first"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=not wait)
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-item calls into one batched call.
+
+    Items are collected for up to ``max_latency_ms`` or until ``max_batch``
+    are waiting, then ``batch_fn(items)`` is scheduled once through ``run``
+    (e.g. ``InferenceExecutor.run``) and each caller receives its own result.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, batch_fn, run, max_latency_ms=2.0, max_batch=64):
+        self.batch_fn = batch_fn
+        self.run = run
+        self.max_latency = max_latency_ms / 1000
+        self.max_batch = max_batch
+        self._pending = []
+        self._timer = None
+        self.stats = {"batches": 0, "items": 0, "largest_batch": 0}
+
+    async def submit(self, item):
+        """Queue one item and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_latency, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run_batch(batch))
+
+    async def _run_batch(self, batch):
+        self.stats["batches"] += 1
+        self.stats["items"] += len(batch)
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+
+        try:
+            results = await self.run(self.batch_fn, [item for item, _ in batch])
+        except QueueFullError as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(e)
+                return
+            # Don't let one bad item fail its neighbours: retry them one by one
+            await asyncio.gather(*(self._run_batch([entry]) for entry in batch))
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
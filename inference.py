@@ -0,0 +1,454 @@
+import hashlib
+import json
+import os
+import pickle
+import sys
+
+import numpy as np
+
+from preprocessing import FeatureEncoder, pipeline_from_metadata
+
+# Bump whenever the bundle layout changes; load_bundle refuses other versions
+BUNDLE_SCHEMA_VERSION = 1
+
+# Trained artifacts live next to the code, wherever the process is started from
+ARTIFACT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Memory-mappable model bundle written by train_model.py
+BUNDLE_DIR = os.path.join(ARTIFACT_DIR, "model_bundle")
+
+# Rows encoded, scaled and scored per call in batch scoring
+BATCH_CHUNK_SIZE = 10000
+
+# Score with the scaler folded into the Ridge weights; set FUSED_PREDICTOR=0
+# to go back to the scaler.transform -> model.predict chain
+FUSED_PREDICTOR = os.environ.get("FUSED_PREDICTOR", "1") != "0"
+
+# Score single rows from their active one-hot indices and batches as CSR
+# matrices; set SPARSE_INFERENCE=0 to encode the full dense feature vector
+SPARSE_INFERENCE = os.environ.get("SPARSE_INFERENCE", "1") != "0"
+
+
+def _issparse(X):
+    # Avoid importing scipy just to check: a sparse matrix implies it is loaded
+    sparse = sys.modules.get("scipy.sparse")
+    return sparse is not None and sparse.issparse(X)
+
+
+class LinearPredictor:
+    """Ridge model with the StandardScaler folded into its weights.
+
+    Both steps are affine, so ``model.predict(scaler.transform(X))`` equals
+    ``X @ coef + intercept`` with ``coef = model.coef_ / scale`` and
+    ``intercept = model.intercept_ - coef @ mean``. Scoring is then a single
+    dot product with no sklearn input validation.
+    """
+
+    def __init__(self, coef, intercept):
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None):
+        coef = np.asarray(model.coef_, dtype=np.float64)
+        intercept = float(model.intercept_)
+
+        if scaler is not None:
+            mean = scaler.mean_ if scaler.with_mean else 0.0
+            scale = scaler.scale_ if scaler.with_std else 1.0
+            coef = coef / scale
+            intercept -= float(np.dot(coef, np.broadcast_to(mean, coef.shape)))
+
+        return cls(coef, intercept)
+
+    def predict(self, X):
+        """Predict prices for a 2-D feature matrix, dense or scipy sparse"""
+        if _issparse(X):
+            return X @ self.coef + self.intercept
+        return np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+
+    def predict_sparse(self, indices, values):
+        """Predict the price of one row given as the ``(indices, values)`` of its non-zero features"""
+        return float(self.coef[indices] @ values) + self.intercept
+
+
+class SklearnPredictor:
+    """The original scaler.transform -> model.predict chain behind the same interface"""
+
+    def __init__(self, model, scaler=None, feature_columns=None):
+        self.model = model
+        self.scaler = scaler
+        self.feature_columns = feature_columns
+
+    def predict(self, X):
+        """Predict prices for a 2-D feature matrix"""
+        import pandas as pd
+
+        if _issparse(X):
+            X = X.toarray()
+        if not isinstance(X, pd.DataFrame) and self.feature_columns is not None:
+            # The scaler was fitted with feature names
+            X = pd.DataFrame(X, columns=self.feature_columns)
+        if self.scaler is not None:
+            X = self.scaler.transform(X)
+        return self.model.predict(X)
+
+    def predict_sparse(self, indices, values):
+        """Predict the price of one row given as the ``(indices, values)`` of its non-zero features"""
+        row = np.zeros((1, len(self.model.coef_)))
+        row[0, indices] = values
+        return float(self.predict(row)[0])
+
+
+def t_quantile(p, df):
+    """Student t quantile from the normal one (Cornish-Fisher), to ~1e-4 for df > 30 without scipy"""
+    from statistics import NormalDist
+
+    z = NormalDist().inv_cdf(p)
+    return z + (z ** 3 + z) / (4 * df) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+
+
+class PredictionInterval:
+    """Closed-form prediction interval of the linear model, from arrays written by train_model.py.
+
+    The half-width at raw features x is
+    t * sigma * sqrt(1 + 1/n + ||x @ factor - offset||^2), so one row costs a
+    (non-zeros x rank) product and a batch one sparse matrix product.
+    """
+
+    def __init__(self, factor, offset, stats):
+        self.factor = factor
+        self.offset = np.asarray(offset, dtype=np.float64)
+        self.sigma, self.n_train, self.df_resid = (float(v) for v in stats)
+        self._multipliers = {}
+
+    def multiplier(self, level):
+        """t critical value for a two-sided ``level`` interval, cached per level"""
+        if not 0 < level < 1:
+            raise ValueError(f"Interval level must be between 0 and 1, got {level}")
+        if level not in self._multipliers:
+            self._multipliers[level] = t_quantile(0.5 + level / 2, self.df_resid)
+        return self._multipliers[level]
+
+    def half_width(self, X, level):
+        """Half-widths for a 2-D feature matrix, dense or scipy sparse"""
+        projected = np.asarray(X @ self.factor) - self.offset
+        leverage = np.einsum('ij,ij->i', projected, projected)
+        return self.multiplier(level) * self.sigma * np.sqrt(1 + 1 / self.n_train + leverage)
+
+    def half_width_sparse(self, indices, values, level):
+        """Half-width for one row given as the ``(indices, values)`` of its non-zero features"""
+        projected = values @ self.factor[indices] - self.offset
+        return self.multiplier(level) * self.sigma * float(np.sqrt(1 + 1 / self.n_train + projected @ projected))
+
+
+class FeatureAttribution:
+    """Exact per-field price contributions of the linear model.
+
+    On standardized features the price is ``intercept + sum(coef_i * z_i)``
+    with ``z_i = (x_i - mean_i) / scale_i``, so column i adds
+    ``fused_coef_i * (x_i - mean_i)`` to the price of the average training
+    house (``baseline``). Columns are summed back to their raw field, e.g. all
+    Neighborhood_* dummies into Neighborhood, with one product against a
+    (columns x fields) grouping matrix. The contributions of a row add up to
+    its prediction.
+    """
+
+    def __init__(self, fused_coef, mean, scale, baseline, column_field, fields, numeric_fields=()):
+        self.coef = np.asarray(fused_coef, dtype=np.float64)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.baseline = float(baseline)
+        self.fields = list(fields)
+        self.numeric = np.isin(self.fields, list(numeric_fields))
+
+        grouped = column_field >= 0
+        self.groups = np.zeros((len(self.coef), len(self.fields)))
+        self.groups[np.flatnonzero(grouped), column_field[grouped]] = 1.0
+        self.offset = (self.coef * self.mean) @ self.groups
+
+    def contributions(self, X):
+        """(rows x fields) contributions for a 2-D feature matrix, dense or scipy sparse"""
+        if _issparse(X):
+            weighted = X.multiply(self.coef).tocsr()
+        else:
+            weighted = np.asarray(X, dtype=np.float64) * self.coef
+        return np.asarray(weighted @ self.groups) - self.offset
+
+    def contributions_sparse(self, indices, values):
+        """Per-field contributions of one row given as the ``(indices, values)`` of its non-zero features"""
+        return (values * self.coef[indices]) @ self.groups[indices] - self.offset
+
+    def top(self, contributions, k):
+        """Field names and contributions of the ``k`` largest effects (by magnitude) in each row"""
+        contributions = np.atleast_2d(contributions)
+        order = np.argsort(-np.abs(np.nan_to_num(contributions)), axis=1)[:, :k]
+        return np.array(self.fields)[order], np.take_along_axis(contributions, order, axis=1)
+
+    def spread(self):
+        """Standard deviation of each field's contribution across the training houses.
+
+        Follows from the scaler statistics alone: a numeric column varies by
+        ``|fused_coef| * scale``. The dummies of a categorical field are
+        exclusive with column means p_j, so its contribution has variance
+        ``sum(c_j^2 p_j) - (sum(c_j p_j))^2``.
+        """
+        numeric = (self.coef * self.scale) ** 2 @ self.groups
+        categorical = (self.coef ** 2 * self.mean) @ self.groups - self.offset ** 2
+        return np.sqrt(np.maximum(np.where(self.numeric, numeric, categorical), 0))
+
+
+def bundle_arrays(model, scaler, feature_columns):
+    """Collect the arrays stored in a model bundle from fitted sklearn objects"""
+    n_features = len(feature_columns)
+    mean = scaler.mean_ if scaler is not None and scaler.with_mean else np.zeros(n_features)
+    scale = scaler.scale_ if scaler is not None and scaler.with_std else np.ones(n_features)
+    fused = LinearPredictor.from_sklearn(model, scaler)
+
+    return {
+        'coef': np.asarray(model.coef_, dtype=np.float64),
+        'intercept': np.array([model.intercept_], dtype=np.float64),
+        'mean': np.asarray(mean, dtype=np.float64),
+        'scale': np.asarray(scale, dtype=np.float64),
+        'fused_coef': fused.coef,
+        'fused_intercept': np.array([fused.intercept]),
+        'feature_columns': np.array(feature_columns, dtype=str),
+    }
+
+
+def fingerprint(arrays):
+    """Short content hash of bundle arrays, used as the model version"""
+    digest = hashlib.sha256()
+    for name in sorted(arrays):
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+    return digest.hexdigest()[:12]
+
+
+def make_manifest(arrays, metadata=None):
+    """Manifest describing a set of bundle arrays"""
+    return {
+        'schema_version': BUNDLE_SCHEMA_VERSION,
+        'model_version': fingerprint(arrays),
+        'arrays': sorted(arrays),
+        'metadata': metadata or {},
+    }
+
+
+def save_bundle(path, arrays, metadata=None):
+    """Write arrays as .npy files plus a manifest.json into the bundle directory.
+
+    The manifest is written last, so a bundle is only picked up once complete.
+    """
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        # Replace rather than overwrite: running workers may have the old file mapped
+        tmp_path = os.path.join(path, f"{name}.npy.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(array), allow_pickle=False)
+        os.replace(tmp_path, os.path.join(path, f"{name}.npy"))
+
+    manifest = make_manifest(arrays, metadata)
+    tmp_path = os.path.join(path, "manifest.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, "manifest.json"))
+    return manifest
+
+
+def load_bundle(path, mmap_mode='r'):
+    """Open a model bundle; arrays are memory-mapped so worker processes share pages"""
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+
+    if manifest.get('schema_version') != BUNDLE_SCHEMA_VERSION:
+        raise ValueError(
+            f"Unsupported model bundle schema {manifest.get('schema_version')!r}, "
+            f"expected {BUNDLE_SCHEMA_VERSION}"
+        )
+
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+        for name in manifest['arrays']
+    }
+    return ModelBundle(manifest, arrays)
+
+
+class ModelBundle:
+    """Loaded model bundle: the manifest and its (memory-mapped) arrays"""
+
+    def __init__(self, manifest, arrays):
+        self.manifest = manifest
+        self.arrays = arrays
+
+    @classmethod
+    def from_sklearn(cls, model, scaler, feature_columns):
+        """In-memory bundle built from fitted sklearn objects (the pickle artifacts)"""
+        arrays = bundle_arrays(model, scaler, feature_columns)
+        return cls(make_manifest(arrays), arrays)
+
+    @property
+    def version(self):
+        return self.manifest['model_version']
+
+    @property
+    def feature_columns(self):
+        return self.arrays['feature_columns'].tolist()
+
+    def predictor(self):
+        """Fused linear predictor scoring straight from the mapped weights"""
+        return LinearPredictor(self.arrays['fused_coef'], self.arrays['fused_intercept'][0])
+
+    def attribution(self, encoder):
+        """Per-field attribution of the model's predictions, grouped by the encoder's fields"""
+        return FeatureAttribution(
+            self.arrays['fused_coef'], self.arrays['mean'], self.arrays['scale'], self.arrays['intercept'][0],
+            encoder.column_field, encoder.fields, encoder.numeric_index
+        )
+
+    def interval(self):
+        """Prediction-interval model, or None for bundles trained before intervals were stored"""
+        if 'interval_factor' not in self.arrays:
+            return None
+        return PredictionInterval(
+            self.arrays['interval_factor'], self.arrays['interval_offset'], self.arrays['interval_stats']
+        )
+
+
+class ServingModel:
+    """One loaded set of artifacts, swapped in as a unit so a request never mixes versions"""
+
+    def __init__(self, predictor, encoder=None, bundle=None, model=None, scaler=None, interval=None, attribution=None):
+        self.predictor = predictor
+        self.encoder = encoder
+        self.bundle = bundle
+        self.model = model
+        self.scaler = scaler
+        self.interval = interval
+        self.attribution = attribution
+        # Index of the training sales for the comparables lookup, attached by the app at load time
+        self.comparables = None
+
+    @property
+    def version(self):
+        return self.bundle.version if self.bundle is not None else None
+
+    @property
+    def feature_columns(self):
+        return self.encoder.feature_columns if self.encoder is not None else None
+
+
+def load_artifacts():
+    """Load the trained model and scaler without making them live"""
+    # Prefer the bundle: it is memory-mapped and scores without importing sklearn
+    if FUSED_PREDICTOR and os.path.exists(os.path.join(BUNDLE_DIR, "manifest.json")):
+        bundle = load_bundle(BUNDLE_DIR)
+        pipeline = pipeline_from_metadata(bundle.manifest.get('metadata', {}))
+        encoder = FeatureEncoder(bundle.feature_columns, pipeline=pipeline)
+        return ServingModel(
+            bundle.predictor(), encoder, bundle, interval=bundle.interval(), attribution=bundle.attribution(encoder)
+        )
+
+    model = scaler = feature_columns = encoder = predictor = bundle = attribution = None
+
+    # Load the model
+    if os.path.exists(os.path.join(ARTIFACT_DIR, "model.pkl")):
+        with open(os.path.join(ARTIFACT_DIR, "model.pkl"), "rb") as f:
+            model = pickle.load(f)
+
+    # Load the scaler
+    if os.path.exists(os.path.join(ARTIFACT_DIR, "scaler.pkl")):
+        with open(os.path.join(ARTIFACT_DIR, "scaler.pkl"), "rb") as f:
+            scaler = pickle.load(f)
+
+    # Load feature columns
+    if os.path.exists(os.path.join(ARTIFACT_DIR, "feature_columns.pkl")):
+        with open(os.path.join(ARTIFACT_DIR, "feature_columns.pkl"), "rb") as f:
+            feature_columns = pickle.load(f)
+        # The fitted preprocessing is saved in the bundle manifest next to the pickles
+        metadata = {}
+        if os.path.exists(os.path.join(BUNDLE_DIR, "manifest.json")):
+            with open(os.path.join(BUNDLE_DIR, "manifest.json")) as f:
+                metadata = json.load(f).get('metadata', {})
+        encoder = FeatureEncoder(feature_columns, pipeline=pipeline_from_metadata(metadata))
+
+    # Build the inference kernel
+    if model is not None:
+        if FUSED_PREDICTOR:
+            predictor = LinearPredictor.from_sklearn(model, scaler)
+        else:
+            predictor = SklearnPredictor(model, scaler, feature_columns)
+        if feature_columns is not None:
+            bundle = ModelBundle.from_sklearn(model, scaler, feature_columns)
+            attribution = bundle.attribution(encoder)
+
+    return ServingModel(predictor, encoder, bundle, model, scaler, attribution=attribution)
+
+
+class IntervalUnavailableError(ValueError):
+    """An interval was asked of a model saved without interval data"""
+
+
+def require_interval(state):
+    """The serving model's interval data; models trained before intervals were stored have none"""
+    if state.interval is None:
+        raise IntervalUnavailableError(f"Model {state.version} has no prediction interval data; retrain it with train_model.py")
+    return state.interval
+
+
+def check_explain(k):
+    """Validate the number of top contributions asked for"""
+    if k < 1:
+        raise ValueError(f"explain must be at least 1, got {k}")
+    return k
+
+
+def encode_frame(df, state):
+    """Encode a frame for ``state``'s predictor; returns the features and a mask of rows that encoded to finite values"""
+    if SPARSE_INFERENCE:
+        features = state.encoder.encode_frame_sparse(df)
+        return features, np.isfinite(np.asarray(features.sum(axis=1)).ravel())
+    features = state.encoder.encode_frame_dense(df)
+    return features, np.isfinite(features).all(axis=1)
+
+
+def predict_frame(df, state, level=None, explain=None):
+    """Score a frame of complete property records (FEATURE_FIELDS columns) chunk by chunk.
+
+    With an interval ``level`` or an ``explain`` count returns
+    ``(predictions, half_widths, top_fields, top_contributions)``: the
+    half-widths of the prediction intervals and the ``explain`` largest
+    per-field contributions of each row (None when not asked for), all
+    computed from the same encoded chunks. Explained predictions are the sum
+    of their contributions, so the model is not called a second time.
+    """
+    if level is not None:
+        require_interval(state)
+
+    # Rows that encode to non-finite features (e.g. log of a zero lot size) get NaN
+    predictions = np.full(len(df), np.nan)
+    half_widths = np.full(len(df), np.nan) if level is not None else None
+    if explain is not None:
+        k = min(check_explain(explain), len(state.attribution.fields))
+        top_fields = np.full((len(df), k), None, dtype=object)
+        top_contributions = np.full((len(df), k), np.nan)
+    else:
+        top_fields = top_contributions = None
+    for start in range(0, len(df), BATCH_CHUNK_SIZE):
+        chunk = df.iloc[start:start + BATCH_CHUNK_SIZE]
+        rows = slice(start, start + len(chunk))
+        features, valid = encode_frame(chunk, state)
+        if not valid.any():
+            continue
+        if explain is not None:
+            contributions = state.attribution.contributions(features[valid])
+            predictions[rows][valid] = state.attribution.baseline + contributions.sum(axis=1)
+            top_fields[rows][valid], top_contributions[rows][valid] = state.attribution.top(contributions, k)
+        else:
+            predictions[rows][valid] = state.predictor.predict(features[valid])
+        if level is not None:
+            half_widths[rows][valid] = state.interval.half_width(features[valid], level)
+
+    if level is None and explain is None:
+        return predictions
+    return predictions, half_widths, top_fields, top_contributions
@@ -0,0 +1,415 @@
+import numpy as np
+
+# pandas and scipy are only needed for frame encoding; they are imported where
+# used so that the single-record path keeps worker startup light
+
+# Raw property fields accepted by the prediction endpoints, in form order
+FEATURE_FIELDS = [
+    'Building_Class', 'Zoning_Class', 'Lot_Extent', 'Lot_Size', 'Lane_Type',
+    'Property_Shape', 'Land_Outline', 'Lot_Configuration', 'Property_Slope',
+    'Neighborhood', 'Condition1', 'House_Type', 'House_Design', 'Overall_Material',
+    'House_Condition', 'House_life', 'Roof_Design', 'Exterior1st', 'Exterior2nd',
+    'Brick_Veneer_Type', 'Brick_Veneer_Area', 'Exterior_Material', 'Exterior_Condition',
+    'Foundation_Type', 'Basement_Height', 'Basement_Condition', 'Exposure_Level',
+    'BsmtFinType1', 'BsmtFinSF1', 'BsmtFinType2', 'BsmtFinSF2', 'BsmtUnfSF',
+    'Total_Basement_Area', 'Heating_Quality', 'Air_Conditioning', 'Electrical_System',
+    'First_Floor_Area', 'Second_Floor_Area', 'Grade_Living_Area',
+    'Underground_Full_Bathroom', 'Underground_Half_Bathroom', 'Full_Bathroom_Above_Grade',
+    'Half_Bathroom_Above_Grade', 'Bedroom_Above_Grade', 'Kitchen_Quality',
+    'Rooms_Above_Grade', 'Functional_Rate', 'Fireplaces', 'Fireplace_Quality', 'Garage',
+    'Garage_Finish_Year', 'Garage_Size', 'Garage_Area', 'Garage_Quality',
+    'Garage_Condition', 'Pavedd_Drive', 'W_Deck_Area', 'Open_Lobby_Area',
+    'Enclosed_Lobby_Area', 'Screen_Lobby_Area', 'Fence_Quality', 'Sale_Type',
+    'Sale_Condition'
+]
+
+# Discrete numerical features that are one-hot encoded like categoricals
+DISCRETE_COLS = ['Garage_Size', 'Fireplaces', 'Rooms_Above_Grade', 'Bedroom_Above_Grade',
+                 'Half_Bathroom_Above_Grade', 'Full_Bathroom_Above_Grade',
+                 'Underground_Half_Bathroom', 'Underground_Full_Bathroom',
+                 'House_Condition', 'Overall_Material', 'Building_Class']
+
+# Missing values that mean "feature absent" rather than "unknown"
+MISSING_VALUE_MAPPINGS = {
+    'Lane_Type': 'No_Allay_Access',
+    'Basement_Height': 'No_Basement',
+    'Basement_Condition': 'No_Basement',
+    'Exposure_Level': 'No_Basement',
+    'BsmtFinType1': 'No_Basement',
+    'BsmtFinType2': 'No_Basement',
+    'Fireplace_Quality': 'No_Fireplace',
+    'Garage': 'No_Garage',
+    'Garage_Finish_Year': 'No_Garage',
+    'Garage_Quality': 'No_Garage',
+    'Garage_Condition': 'No_Garage',
+    'Pool_Quality': 'No_Pool',
+    'Fence_Quality': 'No_Fence'
+}
+
+# Default values for features not supplied to the JSON API endpoints
+DEFAULT_VALUES = {
+    'Zoning_Class': 'RLD', 'Lot_Extent': 60.0, 'Lane_Type': 'Grvl',
+    'Property_Shape': 'Reg', 'Land_Outline': 'Lvl', 'Lot_Configuration': 'I',
+    'Property_Slope': 'GS', 'Condition1': 'Norm', 'House_Design': '1Story',
+    'Roof_Design': 'Gable', 'Exterior1st': 'VinylSd', 'Exterior2nd': 'VinylSd',
+    'Brick_Veneer_Type': None, 'Brick_Veneer_Area': 0.0, 'Exterior_Material': 'TA',
+    'Exterior_Condition': 'TA', 'Basement_Height': 'TA', 'Basement_Condition': 'TA',
+    'Exposure_Level': 'No', 'BsmtFinType1': 'GLQ', 'BsmtFinSF1': 0,
+    'BsmtFinType2': 'Unf', 'BsmtFinSF2': 0, 'BsmtUnfSF': 0, 'Total_Basement_Area': 0,
+    'Heating_Quality': 'TA', 'Air_Conditioning': 'N', 'Electrical_System': 'SBrkr',
+    'Second_Floor_Area': 0, 'Underground_Full_Bathroom': 0, 'Underground_Half_Bathroom': 0,
+    'Full_Bathroom_Above_Grade': 1, 'Half_Bathroom_Above_Grade': 0, 'Bedroom_Above_Grade': 3,
+    'Kitchen_Quality': 'TA', 'Rooms_Above_Grade': 6, 'Functional_Rate': 'TF',
+    'Fireplaces': 0, 'Fireplace_Quality': 'No_Fireplace', 'Garage': 'Attchd',
+    'Garage_Finish_Year': 'Unf', 'Garage_Size': 2, 'Garage_Quality': 'TA',
+    'Garage_Condition': 'TA', 'Pavedd_Drive': 'Y', 'W_Deck_Area': 0,
+    'Open_Lobby_Area': 0, 'Enclosed_Lobby_Area': 0, 'Screen_Lobby_Area': 0,
+    'Fence_Quality': 'No_Fence', 'Sale_Type': 'WD', 'Sale_Condition': 'Normal'
+}
+
+LOG_FEATURES = ['Lot_Extent', 'Lot_Size']
+CUBE_ROOT_FEATURES = ['Brick_Veneer_Area', 'BsmtFinSF2', 'Screen_Lobby_Area']
+CLIPPED_FEATURES = ['Garage_Area', 'W_Deck_Area', 'Open_Lobby_Area', 'Enclosed_Lobby_Area']
+
+
+# Houses are aged relative to this year: House_life = year - Construction_Year
+HOUSE_LIFE_YEAR = 2023
+
+
+def category_key(value):
+    """The dummy-column suffix naming a categorical value; integral floats name their integer (2.0 -> "2")"""
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def make_pipeline(fill_values=None):
+    """Preprocessing parameters shared by training and every serving path.
+
+    ``fill_values`` are the fitted imputation values; the structural "absent"
+    categories take precedence over them, as in train_model.clean_data. The
+    result is JSON, saved in the model bundle manifest.
+    """
+    return {
+        'log': list(LOG_FEATURES),
+        'cube_root': list(CUBE_ROOT_FEATURES),
+        'clip': list(CLIPPED_FEATURES),
+        'house_life_year': HOUSE_LIFE_YEAR,
+        'fill_values': {**(fill_values or {}), **MISSING_VALUE_MAPPINGS},
+    }
+
+
+def pipeline_from_metadata(metadata):
+    """The pipeline saved in a bundle manifest's metadata, rebuilt for bundles from before it was saved"""
+    return metadata.get('pipeline') or make_pipeline(metadata.get('fill_values'))
+
+
+class FeatureEncoder:
+    """The fitted preprocessing pipeline: raw property records to the training feature layout.
+
+    Built once from ``feature_columns`` and the ``pipeline`` parameters saved
+    with the model. House_life is derived from Construction_Year when not
+    given, missing values take the fitted fill values, the numeric transforms
+    are applied and every categorical value is mapped to its precomputed
+    one-hot column index. train_model.py builds its design matrix with
+    ``encode_frame_dense``, and every serving path encodes through the same
+    object, so training and serving cannot drift apart.
+    """
+
+    def __init__(self, feature_columns, fields=FEATURE_FIELDS, pipeline=None):
+        self.feature_columns = list(feature_columns)
+        self.n_features = len(self.feature_columns)
+        column_index = {col: i for i, col in enumerate(self.feature_columns)}
+
+        # Numeric fields keep their own column; everything else is one-hot encoded
+        self.numeric_index = {field: column_index[field] for field in fields if field in column_index}
+        self.category_index = {field: {} for field in fields if field not in self.numeric_index}
+
+        # Dummy columns are named "<field>_<value>"; match the longest field name
+        # first so that e.g. Garage_Size_2 is not taken for a Garage value
+        prefixes = sorted(self.category_index, key=len, reverse=True)
+        for col, i in column_index.items():
+            if col in self.numeric_index:
+                continue
+            for field in prefixes:
+                if col.startswith(field + '_'):
+                    self.category_index[field][col[len(field) + 1:]] = i
+                    break
+
+        # Position in ``fields`` of the raw field behind every column (-1 if none),
+        # for summing per-column values back to fields
+        self.fields = list(fields)
+        self.column_field = np.full(self.n_features, -1, dtype=np.intp)
+        for position, field in enumerate(self.fields):
+            if field in self.numeric_index:
+                self.column_field[self.numeric_index[field]] = position
+            else:
+                self.column_field[list(self.category_index[field].values())] = position
+
+        # Category codes hold column indices; int16 while the layout allows it
+        self.code_dtype = np.int16 if self.n_features < 2 ** 15 else np.int32
+
+        self.pipeline = pipeline or make_pipeline()
+        self.house_life_year = self.pipeline['house_life_year']
+        self.fill_values = {field: value for field, value in self.pipeline['fill_values'].items()
+                            if field in self.fields}
+
+        # Numeric columns in field order, and the positions within them to transform
+        self._numeric_fields = list(self.numeric_index)
+        self._numeric_cols = np.array(list(self.numeric_index.values()), dtype=np.intp)
+        self._log_pos = self._positions(self.pipeline['log'])
+        self._cube_root_pos = self._positions(self.pipeline['cube_root'])
+        self._clip_pos = self._positions(self.pipeline['clip'])
+        # Fill value of each numeric column (NaN if none) and the dummy column of each categorical fill
+        self._numeric_fill = np.array([self.fill_values.get(field, np.nan) for field in self._numeric_fields],
+                                      dtype=np.float64)
+        self._fill_codes = {field: vocabulary.get(category_key(self.fill_values[field]), -1)
+                            for field, vocabulary in self.category_index.items() if field in self.fill_values}
+
+    def _positions(self, fields):
+        return np.array([self._numeric_fields.index(f) for f in fields if f in self.numeric_index], dtype=np.intp)
+
+    def prepare(self, record):
+        """Derive House_life and fill the missing values of a raw record, as at training time.
+
+        Returns the record itself when there is nothing to fill.
+        """
+        derive = ('House_life' in self.numeric_index and record.get('House_life') is None
+                  and record.get('Construction_Year') is not None)
+        missing = [field for field in self.fill_values if record.get(field) is None]
+        if not (derive or missing):
+            return record
+
+        record = dict(record)
+        if derive:
+            record['House_life'] = self.house_life_year - record['Construction_Year']
+        for field in missing:
+            if record.get(field) is None:
+                record[field] = self.fill_values[field]
+        return record
+
+    def prepare_frame(self, df):
+        """Derive House_life and fill the missing values of a frame in the training CSV schema.
+
+        The frame counterpart of ``prepare``: missing values take the fitted
+        fill values, and fields without one the API defaults. Categorical
+        fields come back as category dtype, so ``frame_codes`` maps each
+        distinct value once. Returns the feature frame and a per-row reject
+        reason ("" for rows that can be encoded): invalid numbers, categories
+        never seen in training and values missing without a fill.
+        """
+        import pandas as pd
+
+        n_rows = len(df)
+        numeric = set(self.numeric_index) | set(DISCRETE_COLS)
+        if 'House_life' not in df.columns and 'Construction_Year' in df.columns:
+            df = df.assign(
+                House_life=self.house_life_year - pd.to_numeric(df['Construction_Year'], errors='coerce')
+            )
+
+        columns, flags = {}, []
+        for field in self.fields:
+            column = df[field] if field in df.columns else pd.Series(np.nan, index=df.index)
+            fill = self.fill_values.get(field)
+            if fill is None:
+                fill = DEFAULT_VALUES.get(field)
+            invalid = np.zeros(n_rows, dtype=bool)
+            if field in numeric:
+                values = pd.to_numeric(column, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+                invalid |= np.isnan(values) & column.notna().to_numpy()
+                if fill is not None:
+                    values = np.where(np.isnan(values), fill, values)
+                if field in DISCRETE_COLS:
+                    # Counts and classes are categories named by their integer value ("Garage_Size_2")
+                    integral = np.isnan(values) | (values == np.round(values))
+                    invalid |= ~integral
+                    values = np.where(integral, np.round(values), np.nan)
+                    codes, uniques = pd.factorize(values)
+                    column = pd.Categorical.from_codes(codes, uniques.astype(np.int64))
+                else:
+                    column = values
+                missing = np.isnan(values)
+            else:
+                # Fill in code space: one factorize per column, no string scans
+                codes, uniques = pd.factorize(column)
+                missing = codes == -1
+                if fill is not None and missing.any():
+                    if fill not in uniques:
+                        uniques = uniques.append(pd.Index([fill]))
+                    codes[missing] = uniques.get_loc(fill)
+                    missing = codes == -1
+                column = pd.Categorical.from_codes(codes, uniques)
+
+            flags.append((f"invalid {field}; ", invalid))
+            if field in self.category_index:
+                # Values never seen in training would encode as all-zero dummies, as InputValidator rejects them
+                vocabulary = self.category_index[field]
+                known = np.array([category_key(value) in vocabulary for value in column.categories] + [True])
+                flags.append((f"unknown {field}; ", ~known[column.codes]))
+            # A null default (e.g. no brick veneer) means missing is a valid "no category"
+            if not (field in DEFAULT_VALUES and DEFAULT_VALUES[field] is None):
+                flags.append((f"missing {field}; ", missing & ~invalid))
+            columns[field] = column
+
+        reasons = np.full(n_rows, "", dtype=object)
+        for reason, rows in flags:
+            if rows.any():
+                reasons[rows] += reason
+        return pd.DataFrame(columns, index=df.index), pd.Series(reasons, index=df.index)
+
+    def transform_values(self, field, values):
+        """Apply one numeric field's transform to an array of raw values"""
+        values = np.asarray(values, dtype=np.float64)
+        if field in self.pipeline['log']:
+            return np.log(values)
+        if field in self.pipeline['cube_root']:
+            return values ** (1/3)
+        if field in self.pipeline['clip']:
+            return np.maximum(values, 0)
+        return values
+
+    def _numeric_values(self, record):
+        """Transformed numeric features of a record, aligned with ``_numeric_cols``"""
+        # prepare() has filled what it can; other absent fields encode as 0 and None as NaN
+        values = np.array([record.get(field, 0) for field in self._numeric_fields], dtype=np.float64)
+
+        values[self._log_pos] = np.log(values[self._log_pos])
+        values[self._cube_root_pos] = values[self._cube_root_pos] ** (1/3)
+        values[self._clip_pos] = np.maximum(values[self._clip_pos], 0)
+        return values
+
+    def _active_indices(self, record):
+        """Column indices of the one-hot features switched on by a record"""
+        active = []
+        for field, vocabulary in self.category_index.items():
+            value = record.get(field)
+            if value is not None:
+                # Same "<field>_<value>" naming as get_dummies; unseen values stay all-zero
+                i = vocabulary.get(category_key(value))
+                if i is not None:
+                    active.append(i)
+        return active
+
+    def encode(self, record, out=None):
+        """Encode a raw record dict into a 1-D feature vector.
+
+        ``out`` may be a preallocated, zeroed row of length ``n_features``.
+        """
+        record = self.prepare(record)
+        row = np.zeros(self.n_features) if out is None else out
+        row[self._numeric_cols] = self._numeric_values(record)
+        row[self._active_indices(record)] = 1.0
+        return row
+
+    def encode_sparse(self, record):
+        """Encode a raw record as the ``(indices, values)`` of its non-zero features.
+
+        Only the numeric columns and one active column per categorical are
+        returned, about 60 entries instead of the full feature width.
+        """
+        record = self.prepare(record)
+        active = self._active_indices(record)
+        indices = np.concatenate([self._numeric_cols, np.array(active, dtype=np.intp)])
+        values = np.concatenate([self._numeric_values(record), np.ones(len(active))])
+        return indices, values
+
+    def field_columns(self, field, values):
+        """Column index and feature value that each of ``values`` gives one field.
+
+        Numeric fields map every value to their own column with the transform
+        applied; categorical values map to their dummy column with value 1, or
+        to column -1 (value 0) when unseen. None takes the field's fill value.
+        """
+        fill = self.fill_values.get(field)
+        values = [fill if value is None else value for value in values]
+        if field in self.numeric_index:
+            return np.full(len(values), self.numeric_index[field], dtype=np.intp), self.transform_values(field, values)
+        vocabulary = self.category_index[field]
+        columns = np.array([-1 if value is None else vocabulary.get(category_key(value), -1) for value in values],
+                           dtype=np.intp)
+        return columns, (columns >= 0).astype(np.float64)
+
+    def frame_numeric(self, df):
+        """Transformed numeric features of a frame, aligned with ``_numeric_cols``.
+
+        Missing values take the fitted fill values; absent fields without one are 0.
+        """
+        import pandas as pd
+
+        values = np.full((len(df), len(self._numeric_fields)), np.nan)
+        absent = [j for j, field in enumerate(self._numeric_fields) if field not in df.columns]
+        for j, field in enumerate(self._numeric_fields):
+            if field in df.columns:
+                values[:, j] = df[field].to_numpy(dtype=np.float64, na_value=np.nan)
+
+        if 'House_life' in self.numeric_index and 'Construction_Year' in df.columns:
+            j = self._numeric_fields.index('House_life')
+            derived = self.house_life_year - pd.to_numeric(df['Construction_Year'], errors='coerce').to_numpy(
+                dtype=np.float64, na_value=np.nan)
+            values[:, j] = np.where(np.isnan(values[:, j]), derived, values[:, j])
+        values = np.where(np.isnan(values), self._numeric_fill, values)
+        # Absent fields without a fill value encode as 0, like the old reindex fill
+        values[:, absent] = np.nan_to_num(values[:, absent], nan=0.0)
+
+        values[:, self._log_pos] = np.log(values[:, self._log_pos])
+        values[:, self._cube_root_pos] = values[:, self._cube_root_pos] ** (1/3)
+        values[:, self._clip_pos] = np.maximum(values[:, self._clip_pos], 0)
+        return values
+
+    def frame_codes(self, df):
+        """Fixed-vocabulary codes of a frame's categorical fields.
+
+        Returns a (rows x categorical fields) array holding the dummy column
+        of each value; missing values take the column of the field's fill
+        value, and unseen values (or missing ones without a fill) are -1.
+        Columns of category dtype are mapped through their categories alone;
+        others are factorized first. Either way only the distinct values are
+        looked up.
+        """
+        import pandas as pd
+
+        codes = np.full((len(df), len(self.category_index)), -1, dtype=self.code_dtype)
+        for j, (field, vocabulary) in enumerate(self.category_index.items()):
+            fill = self._fill_codes.get(field, -1)
+            if field not in df.columns:
+                codes[:, j] = fill
+                continue
+            column = df[field]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                value_codes, uniques = column.cat.codes.to_numpy(), column.cat.categories
+            else:
+                # factorize codes missing values as -1
+                value_codes, uniques = pd.factorize(column)
+            # Code -1 (missing) picks the last entry
+            lookup = np.array([vocabulary.get(category_key(value), -1) for value in uniques] + [fill], dtype=self.code_dtype)
+            codes[:, j] = lookup[value_codes]
+        return codes
+
+    def encode_frame_sparse(self, df):
+        """Encode a frame of raw records into a CSR matrix of the training features.
+
+        Every row stores one slot per numeric field and one per categorical
+        field; missing and unseen categories are stored as explicit zeros, as
+        with ``get_dummies``. Equal-length rows let the CSR arrays be built
+        directly from the category codes, without a COO sort.
+        """
+        from scipy import sparse
+
+        numeric = self.frame_numeric(df)
+        codes = self.frame_codes(df)
+        n_rows = len(df)
+        indices = np.concatenate([np.broadcast_to(self._numeric_cols, numeric.shape), np.maximum(codes, 0)], axis=1)
+        data = np.concatenate([numeric, codes >= 0], axis=1)
+
+        indptr = np.arange(0, n_rows * indices.shape[1] + 1, indices.shape[1])
+        return sparse.csr_matrix((data.ravel(), indices.ravel(), indptr), shape=(n_rows, self.n_features))
+
+    def encode_frame_dense(self, df):
+        """Encode a frame of raw records into a dense float64 matrix of the training features"""
+        X = np.zeros((len(df), self.n_features))
+        X[:, self._numeric_cols] = self.frame_numeric(df)
+        codes = self.frame_codes(df)
+        for j in range(codes.shape[1]):
+            active = np.flatnonzero(codes[:, j] >= 0)
+            X[active, codes[active, j]] = 1.0
+        return X
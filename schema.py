@@ -0,0 +1,38 @@
+from typing import Literal, Optional
+
+from pydantic import ConfigDict, create_model
+
+from preprocessing import DISCRETE_COLS, FEATURE_FIELDS
+
+
+def category_type(field, vocabulary):
+    """Literal of the values seen for a field at training time (ints for discrete counts)"""
+    if field in DISCRETE_COLS:
+        values = sorted(int(value) for value in vocabulary)
+    else:
+        values = sorted(vocabulary)
+    return Literal[tuple(values)]
+
+
+def build_property_model(encoder):
+    """Pydantic model of one complete property record, built from the encoder's vocabulary.
+
+    Every field in FEATURE_FIELDS is required and unknown keys are rejected.
+    Numeric fields are floats; categorical fields only accept the values the
+    model was trained on, or null for a missing value. The fitted pipeline
+    fills it when the record is encoded: with the structural "absent" category
+    where there is one (No_Garage, No_Basement), otherwise with the most
+    frequent training value, which for discrete counts is a whole number.
+    """
+    fields = {}
+    for field in FEATURE_FIELDS:
+        if field in encoder.numeric_index:
+            fields[field] = (float, ...)
+        else:
+            fields[field] = (Optional[category_type(field, encoder.category_index[field])], ...)
+
+    return create_model(
+        "PropertyRecord",
+        __config__=ConfigDict(extra="forbid"),
+        **fields
+    )
@@ -0,0 +1,162 @@
+import argparse
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from inference import check_explain, load_artifacts, predict_frame
+warnings.filterwarnings('ignore')
+
+# Rows read, scored and written per chunk
+CHUNK_SIZE = 50000
+
+# Model loaded once per worker process by init_worker
+state = None
+
+
+def init_worker():
+    """Load the serving artifacts (memory-mapped, so workers share the pages)"""
+    global state
+    state = load_artifacts()
+
+
+def score_chunk(chunk, level=None, explain=None):
+    """Score one chunk; returns (predictions frame, rejected rows with their reason).
+
+    With an interval ``level`` the frame also has the interval bounds, and
+    with ``explain`` the fields that moved each price most with their
+    contributions.
+    """
+    features, reasons = state.encoder.prepare_frame(chunk)
+
+    predictions = np.full(len(chunk), np.nan)
+    half_widths = np.full(len(chunk), np.nan)
+    # Every chunk gets the same columns, even one without a scored row, so the CSV
+    # header and the Parquet schema are fixed by the options alone
+    if explain is not None:
+        k = min(check_explain(explain), len(state.attribution.fields))
+        top_fields = np.full((len(chunk), k), None, dtype=object)
+        top_contributions = np.full((len(chunk), k), np.nan)
+    else:
+        top_fields = top_contributions = None
+    ok = (reasons == "").to_numpy()
+    if ok.any():
+        if level is None and explain is None:
+            predictions[ok] = predict_frame(features[ok], state)
+        else:
+            predictions[ok], widths, fields, contributions = predict_frame(features[ok], state, level, explain)
+            if level is not None:
+                half_widths[ok] = widths
+            if explain is not None:
+                top_fields[ok], top_contributions[ok] = fields, contributions
+
+    bad_values = ok & ~np.isfinite(predictions)
+    reasons[bad_values] = "non-finite features (e.g. zero or negative lot size); "
+    ok &= ~bad_values
+
+    scored = pd.DataFrame({'predicted_price': predictions[ok]}, index=chunk.index[ok])
+    if level is not None:
+        scored['lower_bound'] = predictions[ok] - half_widths[ok]
+        scored['upper_bound'] = predictions[ok] + half_widths[ok]
+    if top_fields is not None:
+        for i in range(top_fields.shape[1]):
+            scored[f'attribution_{i + 1}_field'] = pd.array(top_fields[ok, i], dtype="string")
+            scored[f'attribution_{i + 1}'] = top_contributions[ok, i]
+    if 'Id' in chunk.columns:
+        scored.insert(0, 'Id', chunk.loc[ok, 'Id'])
+    scored['model_version'] = pd.array([state.version] * len(scored), dtype="string")
+
+    rejects = chunk[~ok].assign(reject_reason=reasons[~ok].str.rstrip("; "))
+    return scored, rejects
+
+
+def read_chunks(path, chunksize):
+    """Stream an input CSV or Parquet file as DataFrame chunks"""
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet input needs pyarrow: pip install pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+class ChunkWriter:
+    """Append DataFrame chunks to a CSV or Parquet file as they arrive"""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._parquet = None
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write(self, df):
+        if self.path.endswith(".parquet"):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        else:
+            df.to_csv(self.path, mode="a", header=self.rows == 0, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def score_file(input_path, output_path, rejects_path, chunksize=CHUNK_SIZE, workers=None, level=None, explain=None):
+    """Score every row of ``input_path``, writing predictions and rejects chunk by chunk.
+
+    Chunks are scored in a process pool; at most two per worker are in
+    flight, so memory stays bounded and output keeps the input order.
+    """
+    workers = workers or os.cpu_count() or 1
+    output, rejects = ChunkWriter(output_path), ChunkWriter(rejects_path)
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        pending = []
+        chunks = read_chunks(input_path, chunksize)
+        for chunk in chunks:
+            pending.append(pool.submit(score_chunk, chunk, level, explain))
+            if len(pending) >= 2 * workers:
+                scored, rejected = pending.pop(0).result()
+                output.write(scored)
+                rejects.write(rejected)
+        for future in pending:
+            scored, rejected = future.result()
+            output.write(scored)
+            rejects.write(rejected)
+
+    output.close()
+    rejects.close()
+    elapsed = time.perf_counter() - start
+    total = output.rows + rejects.rows
+    print(f"Scored {output.rows} rows, rejected {rejects.rows} in {elapsed:.1f}s "
+          f"({total / elapsed:,.0f} rows/s with {workers} workers)")
+    return output.rows, rejects.rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a CSV or Parquet file of properties with the trained model")
+    parser.add_argument("input", help="file with the Property_Price_Train.csv columns (.csv or .parquet)")
+    parser.add_argument("output", help="predictions file (.csv or .parquet)")
+    parser.add_argument("--rejects", help="rows that could not be scored (default: <output>.rejects.csv)")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, help="scoring processes (default: all cores)")
+    parser.add_argument("--interval", type=float, help="add prediction interval bounds at this level, e.g. 0.9")
+    parser.add_argument("--explain", type=int, help="add the fields that moved each price most, e.g. 3")
+    args = parser.parse_args()
+
+    rejects_path = args.rejects or os.path.splitext(args.output)[0] + ".rejects.csv"
+    score_file(args.input, args.output, rejects_path, args.chunksize, args.workers, args.interval, args.explain)
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# The modules live at the repository root, one level up
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def state():
+    """The shipped model artifacts, loaded as the app serves them"""
+    from inference import load_artifacts
+
+    return load_artifacts()
+
+
+@pytest.fixture(scope="session")
+def training_frame():
+    """Every row of the shipped training CSV, as score.py reads it"""
+    return pd.read_csv(os.path.join(ROOT, "Property_Price_Train.csv"))
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocessing import CLIPPED_FEATURES, CUBE_ROOT_FEATURES, DISCRETE_COLS, FEATURE_FIELDS, LOG_FEATURES
+
+
+def reference_encode(raw, encoder):
+    """Frozen pandas encoding the FeatureEncoder replaced: fill, transform, get_dummies, align to the training columns"""
+    df = raw.assign(House_life=encoder.house_life_year - raw['Construction_Year'])[FEATURE_FIELDS]
+    df = df.fillna(encoder.fill_values)
+
+    for col in LOG_FEATURES:
+        df[col] = np.log(df[col])
+    for col in CUBE_ROOT_FEATURES:
+        df[col] = df[col] ** (1/3)
+    for col in CLIPPED_FEATURES:
+        df[col] = df[col].clip(lower=0)
+    for col in DISCRETE_COLS:
+        df[col] = df[col].astype('object')
+
+    encoded = pd.get_dummies(df, drop_first=False)
+    return encoded.reindex(columns=encoder.feature_columns, fill_value=0).to_numpy(dtype=np.float64)
+
+
+@pytest.fixture(scope="module")
+def expected(state, training_frame):
+    return reference_encode(training_frame, state.encoder)
+
+
+@pytest.fixture(scope="module")
+def records(training_frame):
+    """Raw CSV rows as the JSON APIs receive them: None for missing values"""
+    frame = training_frame.astype(object).where(training_frame.notna(), None)
+    return frame.to_dict("records")
+
+
+def test_reference_is_finite(expected):
+    # Every missing value was filled before the transforms
+    assert np.isfinite(expected).all()
+
+
+def test_encode(state, records, expected):
+    X = np.array([state.encoder.encode(record) for record in records])
+    np.testing.assert_array_equal(X, expected)
+
+
+def test_encode_sparse(state, records, expected):
+    X = np.zeros_like(expected)
+    for i, record in enumerate(records):
+        indices, values = state.encoder.encode_sparse(record)
+        X[i, indices] = values
+    np.testing.assert_array_equal(X, expected)
+
+
+def test_encode_frame_sparse(state, training_frame, expected):
+    np.testing.assert_array_equal(state.encoder.encode_frame_sparse(training_frame).toarray(), expected)
+
+
+def test_encode_frame_dense(state, training_frame, expected):
+    np.testing.assert_array_equal(state.encoder.encode_frame_dense(training_frame), expected)
+
+
+def test_prepare_frame(state, training_frame, expected):
+    features, reasons = state.encoder.prepare_frame(training_frame)
+    ok = (reasons == "").to_numpy()
+    # Only the row with a category unseen in training is rejected
+    assert list(reasons[~ok]) == ["unknown Functional_Rate; "]
+    np.testing.assert_array_equal(state.encoder.encode_frame_sparse(features[ok]).toarray(), expected[ok])
@@ -0,0 +1,109 @@
+import inspect
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+
+import app
+import score
+from preprocessing import FEATURE_FIELDS
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app.app) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+def golden(client):
+    """The bundle's golden training records and the prices of the features training fitted on"""
+    state = app.serving
+    records = state.bundle.manifest['metadata']['golden_records']
+    expected = state.predictor.predict(np.asarray(state.bundle.arrays['golden_features']))
+    return state, records, expected
+
+
+def with_house_life(record, encoder):
+    """A raw record as the batch APIs take it: House_life given, missing values still None"""
+    house_life = encoder.prepare(record)['House_life']
+    return {**{field: record.get(field) for field in FEATURE_FIELDS}, 'House_life': house_life}
+
+
+def complete(record, encoder):
+    """A record with every field filled by the pipeline, as the form and full-record API take it"""
+    return {field: encoder.prepare(record)[field] for field in FEATURE_FIELDS}
+
+
+def test_golden_rows_are_shipped(golden):
+    state, records, expected = golden
+    assert len(records) > 0
+    assert app.check_golden(state) == len(records)
+
+
+def test_batch(client, golden):
+    state, records, expected = golden
+    response = client.post("/api/predict/batch", json=[with_house_life(r, state.encoder) for r in records])
+    assert response.status_code == 200
+    assert response.json()["rejected"] == []
+    np.testing.assert_allclose(response.json()["predicted_prices_raw"], expected, rtol=1e-12)
+
+
+def test_full(client, golden):
+    state, records, expected = golden
+    for record, price in zip(records, expected):
+        response = client.post("/api/predict/full", json=complete(record, state.encoder))
+        assert response.status_code == 200
+        assert response.json()["predicted_price"] == pytest.approx(price, rel=1e-12)
+
+
+def test_sweep(client, golden):
+    state, records, expected = golden
+    for record, price in zip(records, expected):
+        base = with_house_life(record, state.encoder)
+        sweep = [{"field": "Lot_Size", "values": [base["Lot_Size"]]}]
+        response = client.post("/api/predict/sweep", json={"base": base, "sweep": sweep})
+        assert response.status_code == 200
+        assert response.json()["base_price"] == pytest.approx(price, rel=1e-12)
+        assert response.json()["predicted_prices"][0] == pytest.approx(price, rel=1e-12)
+
+
+def test_form(client, golden):
+    state, records, expected = golden
+    # The form posts every field under its snake_case name, in FEATURE_FIELDS order
+    params = [param for name, param in inspect.signature(app.predict_price).parameters.items() if name != "request"]
+    for record in records:
+        values = complete(record, state.encoder)
+        # The form's area inputs are whole numbers; the training areas are not
+        for param, field in zip(params, FEATURE_FIELDS):
+            if param.annotation is int:
+                values[field] = round(values[field])
+        price = client.post("/api/predict/full", json=values).json()["predicted_price"]
+
+        response = client.post("/predict", data={param.name: values[field] for param, field in zip(params, FEATURE_FIELDS)})
+        assert response.status_code == 200
+        rendered = re.search(r"\$([\d,]+\.\d\d)", response.text).group(1)
+        assert rendered == f"{price:,.2f}"
+
+
+def test_score_chunk(golden, monkeypatch):
+    state, records, expected = golden
+    monkeypatch.setattr(score, "state", state)
+    scored, rejects = score.score_chunk(pd.DataFrame(records))
+    assert rejects.empty
+    np.testing.assert_allclose(scored["predicted_price"], expected, rtol=1e-12)
+
+
+def test_score_chunk_columns(golden, monkeypatch):
+    # A chunk without a scorable row still has every output column, with the same dtypes
+    state, records, expected = golden
+    monkeypatch.setattr(score, "state", state)
+    scored, _ = score.score_chunk(pd.DataFrame(records), level=0.9, explain=3)
+    empty, rejects = score.score_chunk(pd.DataFrame(records).assign(Functional_Rate="unseen"), level=0.9, explain=3)
+    assert empty.empty and len(rejects) == len(records)
+    assert list(scored.columns) == list(empty.columns)
+    pd.testing.assert_series_equal(scored.dtypes, empty.dtypes)
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+
+import app
+import score
+from preprocessing import DEFAULT_VALUES, FEATURE_FIELDS
+
+# Discrete counts are one-hot encoded; a missing one must take a value that names a category
+DISCRETE_FIELDS = ['Fireplaces', 'Garage_Size']
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app.app) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+def record(client):
+    """A complete golden training record"""
+    encoder = app.serving.encoder
+    golden = encoder.prepare(app.serving.bundle.manifest['metadata']['golden_records'][0])
+    return {field: golden[field] for field in FEATURE_FIELDS}
+
+
+@pytest.fixture(scope="module")
+def filled(record):
+    """The record with the discrete fields set to their pipeline fill values"""
+    fill_values = app.serving.encoder.fill_values
+    return {**record, **{field: fill_values[field] for field in DISCRETE_FIELDS}}
+
+
+def nulled(record):
+    return {**record, **{field: None for field in DISCRETE_FIELDS}}
+
+
+def omitted(record):
+    return {field: value for field, value in record.items() if field not in DISCRETE_FIELDS}
+
+
+def price(client, record):
+    return client.post("/api/predict/full", json=record).json()["predicted_price"]
+
+
+def test_fill_values_name_categories(client):
+    encoder = app.serving.encoder
+    for field in DISCRETE_FIELDS:
+        assert str(encoder.fill_values[field]) in encoder.category_index[field]
+
+
+def test_full(client, record, filled):
+    response = client.post("/api/predict/full", json=nulled(record))
+    assert response.status_code == 200
+    assert response.json()["predicted_price"] == pytest.approx(price(client, filled), rel=1e-12)
+
+
+@pytest.mark.parametrize("make", [nulled, omitted])
+def test_batch(client, record, filled, make):
+    response = client.post("/api/predict/batch", json=[make(record)])
+    assert response.json()["rejected"] == []
+    assert response.json()["predicted_prices_raw"][0] == pytest.approx(price(client, filled), rel=1e-12)
+
+
+@pytest.mark.parametrize("make", [nulled, omitted])
+def test_sweep(client, record, filled, make):
+    sweep = [{"field": "Lot_Size", "values": [record["Lot_Size"]]}]
+    response = client.post("/api/predict/sweep", json={"base": make(record), "sweep": sweep})
+    assert response.status_code == 200
+    assert response.json()["base_price"] == pytest.approx(price(client, filled), rel=1e-12)
+
+
+@pytest.mark.parametrize("make", [nulled, omitted])
+def test_comparables(client, record, filled, make):
+    response = client.post("/api/comparables?k=3", json=[make(record), filled]).json()
+    assert response["rejected"] == []
+    assert response["comparables"][0] == response["comparables"][1]
+
+
+def test_score_chunk(client, record, filled, monkeypatch):
+    monkeypatch.setattr(score, "state", app.serving)
+    scored, rejects = score.score_chunk(pd.DataFrame([nulled(record), omitted(record)]))
+    assert rejects.empty
+    np.testing.assert_allclose(scored["predicted_price"], price(client, filled), rtol=1e-12)
+
+
+def test_minimal_batch_record(client, record):
+    # Only the fields without an API default; everything else is filled
+    minimal = {field: value for field, value in record.items() if field not in DEFAULT_VALUES}
+    response = client.post("/api/predict/batch", json=[minimal])
+    assert response.json()["rejected"] == []
+    assert np.isfinite(response.json()["predicted_prices_raw"][0])
+
+
+def as_floats(record):
+    """The record with its discrete counts sent as JSON floats (2.0 rather than 2)"""
+    return {**record, **{field: float(record[field]) for field in DISCRETE_FIELDS}}
+
+
+def test_integral_floats_validate(filled):
+    assert app.validator.check(as_floats(filled))
+
+
+def test_integral_floats_full(client, filled):
+    response = client.post("/api/predict/full", json=as_floats(filled))
+    assert response.status_code == 200
+    assert response.json()["predicted_price"] == pytest.approx(price(client, filled), rel=1e-12)
+
+
+def test_integral_floats_batch(client, filled):
+    response = client.post("/api/predict/batch", json=[as_floats(filled)])
+    assert response.json()["rejected"] == []
+    assert response.json()["predicted_prices_raw"][0] == pytest.approx(price(client, filled), rel=1e-12)
+
+
+def test_integral_floats_sweep(client, filled):
+    sweep = [{"field": "Garage_Size", "values": [float(filled["Garage_Size"])]}]
+    response = client.post("/api/predict/sweep", json={"base": as_floats(filled), "sweep": sweep})
+    assert response.status_code == 200
+    assert response.json()["base_price"] == pytest.approx(price(client, filled), rel=1e-12)
+    assert response.json()["predicted_prices"][0] == pytest.approx(price(client, filled), rel=1e-12)
+
+
+def test_fractional_count_rejected(client, filled):
+    response = client.post("/api/predict/batch", json=[{**filled, "Garage_Size": 2.5}])
+    assert [problem["field"] for problem in response.json()["rejected"][0]["fields"]] == ["Garage_Size"]
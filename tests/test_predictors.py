@@ -0,0 +1,53 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from inference import ARTIFACT_DIR, BUNDLE_DIR, LinearPredictor, SklearnPredictor, load_bundle
+
+
+def load_pickle(name):
+    with open(os.path.join(ARTIFACT_DIR, name), "rb") as f:
+        return pickle.load(f)
+
+
+@pytest.fixture(scope="module")
+def sklearn_predictor():
+    """The original scaler.transform -> model.predict chain, from the pickled artifacts"""
+    return SklearnPredictor(load_pickle("model.pkl"), load_pickle("scaler.pkl"), load_pickle("feature_columns.pkl"))
+
+
+@pytest.fixture(scope="module", params=["from_sklearn", "bundle"])
+def linear_predictor(request):
+    """The fused predictor, folded from the pickles at load time or read from the bundle"""
+    if request.param == "bundle":
+        return load_bundle(BUNDLE_DIR).predictor()
+    return LinearPredictor.from_sklearn(load_pickle("model.pkl"), load_pickle("scaler.pkl"))
+
+
+@pytest.fixture(scope="module")
+def features(state, training_frame):
+    prepared, reasons = state.encoder.prepare_frame(training_frame)
+    return prepared[(reasons == "").to_numpy()]
+
+
+@pytest.mark.parametrize("layout", ["dense", "csr"])
+def test_fused_matches_sklearn(state, features, sklearn_predictor, linear_predictor, layout):
+    if layout == "dense":
+        X = state.encoder.encode_frame_dense(features)
+    else:
+        X = state.encoder.encode_frame_sparse(features)
+
+    expected = sklearn_predictor.predict(X)
+    assert len(expected) == len(features)
+    np.testing.assert_allclose(linear_predictor.predict(X), expected, rtol=1e-9)
+
+
+def test_single_row_matches_sklearn(state, features, sklearn_predictor, linear_predictor):
+    X = state.encoder.encode_frame_sparse(features[:50])
+    expected = sklearn_predictor.predict(X)
+    for i in range(X.shape[0]):
+        row = X.getrow(i)
+        assert linear_predictor.predict_sparse(row.indices, row.data) == pytest.approx(expected[i], rel=1e-9)
+        assert sklearn_predictor.predict_sparse(row.indices, row.data) == pytest.approx(expected[i], rel=1e-9)
@@ -1,157 +1,797 @@
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import Ridge
+from sklearn.linear_model import ElasticNet, Lasso, LinearRegression, Ridge
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import KFold, train_test_split
+from scipy import stats
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
 import pickle
+import time
 import warnings
+from inference import bundle_arrays, save_bundle
+from preprocessing import DISCRETE_COLS, HOUSE_LIFE_YEAR, MISSING_VALUE_MAPPINGS, FeatureEncoder, make_pipeline
 warnings.filterwarnings('ignore')
 
-def train_and_save_model():
-    """Train the Ridge Regression model and save it for the FastAPI app"""
-    
-    print("Loading dataset...")
-    # Load the dataset
-    df = pd.read_csv("Property_Price_Train.csv")
-    
-    print("Starting data preprocessing...")
-    
-    # Remove ID column
-    df.drop("Id", axis=1, inplace=True)
-    
-    # Create House_life feature
-    df["House_life"] = 2023 - df["Construction_Year"]
-    
-    # Remove date columns
-    df.drop(["Construction_Year", "Remodel_Year", "Garage_Built_Year", "Month_Sold", "Year_Sold"], axis=1, inplace=True)
-    
+DATA_PATH = "Property_Price_Train.csv"
+
+# Parsed data and preprocessed features from earlier runs; safe to delete
+CACHE_DIR = ".train_cache"
+
+# Bump whenever a cached stage changes its logic or layout so old entries are ignored
+CACHE_VERSION = 4
+
+DATE_COLUMNS = ["Construction_Year", "Remodel_Year", "Garage_Built_Year", "Month_Sold", "Year_Sold"]
+
+QUASI_CONSTANT_FEATURES = ['Road_Type', 'Utility_Type', 'Condition2', 'Roof_Quality',
+                           'Heating_Type', 'LowQualFinSF', 'Kitchen_Above_Grade',
+                           'Three_Season_Lobby_Area', 'Pool_Area', 'Pool_Quality', 'Miscellaneous_Value']
+
+# Sale prices more than this many standard deviations from the mean are dropped
+OUTLIER_Z_THRESHOLD = 2.5
+
+# Training rows saved raw with the bundle, next to their design-matrix rows;
+# app.validate_model checks that every serving path encodes them identically
+GOLDEN_ROWS = 20
+
+# Rows read per chunk in streaming mode
+STREAMING_CHUNK_SIZE = 20000
+
+# Ridge settings shared by the in-memory and streaming fits
+RIDGE_ALPHA = 1.0
+TEST_SIZE = 0.3
+SPLIT_SEED = 10
+
+# Held-out and cross-validation scores of the trained model(s), rendered on /analytics
+METRICS_FILE = "model_metrics.json"
+
+# Hyperparameter grids searched by `train_model.py search`. Ridge penalises
+# the squared error sum while Lasso and Elastic Net penalise its mean, hence
+# the different alpha ranges.
+SEARCH_FOLDS = 5
+SEARCH_GRIDS = {
+    'Linear Regression': {},
+    'Ridge': {'alpha': np.logspace(0, 4, 17)},
+    'Lasso': {'alpha': np.logspace(1, 4, 13)},
+    'Elastic Net': {'alpha': np.logspace(-2, 1, 13), 'l1_ratio': [0.1, 0.5, 0.9]},
+}
+
+
+def file_key(path):
+    """Cache key of an input file: its path, size and modification time"""
+    st = os.stat(path)
+    key = f"{CACHE_VERSION}:{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def save_columns(path, df):
+    """Write a frame as one .npy file per column; strings are stored as codes plus uniques"""
+    os.makedirs(path, exist_ok=True)
+    layout = []
+    for i, col in enumerate(df.columns):
+        if df[col].dtype == object:
+            codes, uniques = pd.factorize(df[col])
+            np.save(os.path.join(path, f"{i}.codes.npy"), codes.astype(np.int32))
+            np.save(os.path.join(path, f"{i}.uniques.npy"), np.array(uniques, dtype=str))
+            layout.append([col, "object"])
+        else:
+            np.save(os.path.join(path, f"{i}.npy"), df[col].to_numpy())
+            layout.append([col, str(df[col].dtype)])
+
+    # Written last: a directory without columns.json is an interrupted write
+    with open(os.path.join(path, "columns.json"), "w") as f:
+        json.dump(layout, f)
+
+
+def load_columns(path):
+    """Read a frame written by save_columns, or None if there is no complete copy"""
+    if not os.path.exists(os.path.join(path, "columns.json")):
+        return None
+    with open(os.path.join(path, "columns.json")) as f:
+        layout = json.load(f)
+
+    data = {}
+    for i, (col, dtype) in enumerate(layout):
+        if dtype == "object":
+            codes = np.load(os.path.join(path, f"{i}.codes.npy"))
+            uniques = np.load(os.path.join(path, f"{i}.uniques.npy")).astype(object)
+            # Code -1 marks a missing value
+            data[col] = np.append(uniques, np.nan)[codes]
+        else:
+            data[col] = np.load(os.path.join(path, f"{i}.npy"))
+    return pd.DataFrame(data)
+
+
+def load_data(data_path, cache_dir=None):
+    """Stage 1: parse the training CSV, or read it back from the columnar cache"""
+    cache_path = os.path.join(cache_dir, f"raw-{file_key(data_path)}") if cache_dir else None
+    if cache_path:
+        df = load_columns(cache_path)
+        if df is not None:
+            return df
+
+    # The pyarrow engine parses with several threads when it is installed
+    engine = "pyarrow" if importlib.util.find_spec("pyarrow") else "c"
+    df = pd.read_csv(data_path, engine=engine)
+    if cache_path:
+        save_columns(cache_path, df)
+    return df
+
+
+def clean_data(df):
+    """Drop unused columns, derive House_life and fill structurally missing values"""
+    # Remove ID column and derive the house age before dropping the date columns
+    df = df.drop(columns="Id")
+    df["House_life"] = HOUSE_LIFE_YEAR - df["Construction_Year"]
+    df = df.drop(columns=DATE_COLUMNS)
+
     # Handle missing values with meaningful categories
-    missing_value_mappings = {
-        'Lane_Type': 'No_Allay_Access',
-        'Basement_Height': 'No_Basement',
-        'Basement_Condition': 'No_Basement',
-        'Exposure_Level': 'No_Basement',
-        'BsmtFinType1': 'No_Basement',
-        'BsmtFinType2': 'No_Basement',
-        'Fireplace_Quality': 'No_Fireplace',
-        'Garage': 'No_Garage',
-        'Garage_Finish_Year': 'No_Garage',
-        'Garage_Quality': 'No_Garage',
-        'Garage_Condition': 'No_Garage',
-        'Pool_Quality': 'No_Pool',
-        'Fence_Quality': 'No_Fence'
-    }
-    
-    for col, default_value in missing_value_mappings.items():
-        df[col] = df[col].fillna(default_value)
-    
+    df = df.fillna(MISSING_VALUE_MAPPINGS)
+
     # Drop column with too many missing values
-    df.drop("Miscellaneous_Feature", axis=1, inplace=True)
-    
-    # Impute remaining missing values
-    def impute_null(data):
-        for col in data.columns:
-            if data[col].dtypes == 'int64' or data[col].dtypes == 'float64':
-                data[col].fillna(data[col].mean(), inplace=True)
-            else:
-                data[col].fillna(data[col].value_counts().index[0], inplace=True)
-    
-    impute_null(df)
-    
-    # Convert discrete numerical to categorical
-    discrete_cols = ['Garage_Size', 'Fireplaces', 'Rooms_Above_Grade', 'Bedroom_Above_Grade',
-                     'Half_Bathroom_Above_Grade', 'Full_Bathroom_Above_Grade', 
-                     'Underground_Half_Bathroom', 'Underground_Full_Bathroom', 
-                     'House_Condition', 'Overall_Material', 'Building_Class']
-    
-    for col in discrete_cols:
-        df[col] = df[col].astype('object')
-    
+    return df.drop(columns="Miscellaneous_Feature")
+
+
+def fit_imputation(df):
+    """Fill value for every column: the mean of continuous columns, the most frequent category otherwise.
+
+    Discrete counts are one-hot encoded, so they take their most frequent
+    value too; a mean such as 1.77 garages would match no category.
+    """
+    numeric = df.select_dtypes(include=['int64', 'float64']).columns.difference(DISCRETE_COLS, sort=False)
+    fill_values = {col: float(value) for col, value in df[numeric].mean().items()}
+    for col in df.columns.difference(numeric, sort=False):
+        codes, uniques = pd.factorize(df[col])
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        if not len(counts):
+            continue
+        if (counts == counts.max()).sum() == 1:
+            value = uniques[counts.argmax()]
+        else:
+            # Break ties exactly as value_counts() does
+            value = df[col].value_counts().index[0]
+        fill_values[col] = int(value) if col in DISCRETE_COLS else value
+    return fill_values
+
+
+def impute(df, fill_values):
+    """Fill remaining missing values, touching only the columns that have any"""
+    for col in df.columns[df.isna().any()]:
+        if col in fill_values:
+            df[col] = df[col].fillna(fill_values[col])
+    return df
+
+
+def golden_set(raw, index, fields, X):
+    """Golden rows: raw training records as serving receives them, and their features.
+
+    Records carry Construction_Year instead of House_life and None for
+    missing values, so serving has to derive and impute them as training did.
+    """
+    columns = [col for col in fields if col != 'House_life'] + ['Construction_Year']
+    rows = raw.loc[index, columns].astype(object)
+    return {
+        'golden_records': rows.where(rows.notna(), None).to_dict('records'),
+        'golden_features': np.asarray(X).tolist(),
+    }
+
+
+def categorical_columns(df):
+    """Text columns plus the discrete numerical ones, in frame order"""
+    return [col for col in df.columns if df[col].dtype == object or col in DISCRETE_COLS]
+
+
+def to_codes(df, columns):
+    """Store categorical columns as category dtype: small integer codes over their sorted values"""
+    return df.astype({col: 'category' for col in columns})
+
+
+def prepare_features(df):
+    """Stages 2-3: impute, drop quasi-constant features and outliers, transform and one-hot encode.
+
+    Categorical fields are turned into fixed-vocabulary codes and the
+    feature matrix is written straight from them, without get_dummies or
+    object columns, by the same FeatureEncoder pipeline that serving loads.
+    Returns the feature matrix, the target and the fitted encodings.
+    """
+    raw = df
+    df = clean_data(df)
+    fill_values = fit_imputation(df)
+    df = impute(df, fill_values)
+
     # Remove quasi-constant features
-    quasi_constant_features = ['Road_Type', 'Utility_Type', 'Condition2', 'Roof_Quality', 
-                              'Heating_Type', 'LowQualFinSF', 'Kitchen_Above_Grade', 
-                              'Three_Season_Lobby_Area', 'Pool_Area', 'Pool_Quality', 'Miscellaneous_Value']
-    
-    for feature in quasi_constant_features:
-        if feature in df.columns:
-            df.drop(feature, axis=1, inplace=True)
-    
-    # Rename target variable
-    df.rename(columns={'Sale_Price': 'tar_var'}, inplace=True)
-    
+    df = df.drop(columns=[col for col in QUASI_CONSTANT_FEATURES if col in df.columns])
+
     # Remove outliers from target variable
-    z = np.abs(stats.zscore(df['tar_var']))
-    threshold = 2.5
-    outlier_indices = np.where(z > threshold)[0]
-    df.drop(df.index[outlier_indices], inplace=True)
-    
-    print("Applying feature transformations...")
-    
-    # Separate numerical and categorical features
-    df_num = df.select_dtypes(include=['int64', 'float64'])
-    df_fac = df.select_dtypes(include=['object'])
-    
-    # Apply transformations to numerical features
-    df_num["Lot_Extent"] = np.log(df_num["Lot_Extent"])
-    df_num["Lot_Size"] = np.log(df_num["Lot_Size"])
-    df_num["Brick_Veneer_Area"] = df_num["Brick_Veneer_Area"] ** (1/3)
-    df_num["BsmtFinSF2"] = df_num["BsmtFinSF2"] ** (1/3)
-    df_num["Screen_Lobby_Area"] = df_num["Screen_Lobby_Area"] ** (1/3)
-    
-    # Clip negative areas
-    df_num['Garage_Area'] = df_num['Garage_Area'].clip(lower=0)
-    df_num['W_Deck_Area'] = df_num['W_Deck_Area'].clip(lower=0)
-    df_num['Open_Lobby_Area'] = df_num['Open_Lobby_Area'].clip(lower=0)
-    df_num['Enclosed_Lobby_Area'] = df_num['Enclosed_Lobby_Area'].clip(lower=0)
-    
-    # Combine numerical and categorical data
-    df_combined = pd.concat([df_num, df_fac], axis=1)
-    
-    # Separate target variable
-    tar_var = df_combined['tar_var']
-    df_combined.drop("tar_var", axis=1, inplace=True)
-    
-    # Create dummy variables
-    df_encoded = pd.get_dummies(df_combined, drop_first=False)
-    
-    print("Training Ridge Regression model...")
-    
-    # Split the data
-    X_train, X_test, y_train, y_test = train_test_split(df_encoded, tar_var, test_size=0.3, random_state=10)
-    
+    z = np.abs(stats.zscore(df['Sale_Price']))
+    df = df[z <= OUTLIER_Z_THRESHOLD]
+
+    # Numerical features first, then categoricals, as the training columns always were
+    target = df['Sale_Price']
+    categorical = categorical_columns(df)
+    numeric = [col for col in df.select_dtypes(include=['int64', 'float64']).columns
+               if col not in categorical and col != 'Sale_Price']
+    ranges = {col: [float(df[col].min()), float(df[col].max())] for col in numeric}
+
+    # Dummy columns follow the sorted categories, as get_dummies orders them
+    fields = numeric + categorical
+    df = to_codes(df[fields], categorical)
+    feature_columns = numeric + [f"{col}_{value}" for col in categorical for value in df[col].cat.categories]
+    pipeline = make_pipeline({col: fill_values[col] for col in fields if col in fill_values})
+    X = FeatureEncoder(feature_columns, fields=fields, pipeline=pipeline).encode_frame_dense(df)
+
+    encodings = {
+        'pipeline': pipeline,
+        'ranges': ranges,
+        'feature_columns': feature_columns,
+        **golden_set(raw, df.index[:GOLDEN_ROWS], fields, X[:GOLDEN_ROWS]),
+    }
+    return X, target, encodings
+
+
+def build_features(df, data_key=None, cache_dir=None):
+    """Feature matrix, target and encodings, cached on disk for unchanged inputs"""
+    cache_path = os.path.join(cache_dir, f"features-{data_key}") if cache_dir and data_key else None
+    if cache_path and os.path.exists(os.path.join(cache_path, "encodings.json")):
+        with open(os.path.join(cache_path, "encodings.json")) as f:
+            encodings = json.load(f)
+        X = np.load(os.path.join(cache_path, "X.npy"), mmap_mode='r')
+        y = np.load(os.path.join(cache_path, "y.npy"))
+        return X, y, encodings
+
+    if df is None:
+        raise ValueError("No cached features and no data to build them from")
+    X, target, encodings = prepare_features(df)
+    y = target.to_numpy(dtype=np.float64)
+
+    if cache_path:
+        os.makedirs(cache_path, exist_ok=True)
+        np.save(os.path.join(cache_path, "X.npy"), X)
+        np.save(os.path.join(cache_path, "y.npy"), y)
+        # Written last so a partial entry is never used
+        with open(os.path.join(cache_path, "encodings.json"), "w") as f:
+            json.dump(encodings, f)
+    return X, y, encodings
+
+
+def regression_scores(y_true, y_pred, prefix):
+    """R², RMSE and MAE of predictions, keyed with ``prefix``"""
+    residual = y_true - y_pred
+    return {
+        f'{prefix}_r2': float(1 - residual @ residual / np.sum((y_true - y_true.mean()) ** 2)),
+        f'{prefix}_rmse': float(np.sqrt(np.mean(residual ** 2))),
+        f'{prefix}_mae': float(np.mean(np.abs(residual))),
+    }
+
+
+def fit_model(X, y, feature_columns, model=None):
+    """Stage 4: split, scale and fit the model (Ridge by default); returns the model, scaler and scores"""
+    # Keep the feature names on the scaler, as the serving code expects
+    X = pd.DataFrame(X, columns=feature_columns)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=SPLIT_SEED)
+
     # Scale the features
     scaler = StandardScaler()
     X_train_scaled = scaler.fit_transform(X_train)
     X_test_scaled = scaler.transform(X_test)
-    
+
     # Train Ridge Regression model
-    model = Ridge()
+    if model is None:
+        model = Ridge(alpha=RIDGE_ALPHA)
     model.fit(X_train_scaled, y_train)
-    
-    # Evaluate the model
-    train_score = model.score(X_train_scaled, y_train)
-    test_score = model.score(X_test_scaled, y_test)
-    
-    print(f"Training R² Score: {train_score:.4f}")
-    print(f"Testing R² Score: {test_score:.4f}")
-    
-    # Save the model, scaler, and feature columns
-    print("Saving model and scaler...")
-    
-    with open("model.pkl", "wb") as f:
+
+    scores = {
+        **regression_scores(y_train, model.predict(X_train_scaled), 'train'),
+        **regression_scores(y_test, model.predict(X_test_scaled), 'test'),
+    }
+    return model, scaler, scores
+
+
+def interval_arrays(gram, n, alpha, sse, mean, scale):
+    """Bundle arrays for closed-form prediction intervals of a linear model on standardized features.
+
+    With ``gram`` = Z^T Z of the centered, scaled training rows and
+    A = Z^T Z + alpha I, a ridge prediction at z has variance
+    sigma^2 (1 + 1/n + z^T A^-1 Z^T Z A^-1 z). The middle matrix is stored as
+    a factor L (from one eigendecomposition, L L^T = A^-1 Z^T Z A^-1) with the
+    scaler folded in, so serving computes ||x @ factor - offset||^2 directly
+    from raw features. Null directions (collinear dummies) are dropped, which
+    makes alpha=0 the pseudo-inverse OLS interval.
+    """
+    s2, V = np.linalg.eigh(gram)
+    keep = s2 > s2.max() * len(s2) * np.finfo(np.float64).eps
+    s2, V = s2[keep], V[:, keep]
+
+    df_resid = n - 1 - float(np.sum(s2 / (s2 + alpha)))
+    L = V * (np.sqrt(s2) / (s2 + alpha))
+    return {
+        'interval_factor': L / scale[:, None],
+        'interval_offset': (mean / scale) @ L,
+        'interval_stats': np.array([np.sqrt(sse / df_resid), n, df_resid]),
+    }
+
+
+def fit_interval(X, y, model, scaler):
+    """Prediction-interval arrays for a model fitted by fit_model, from the same training split.
+
+    Exact for Ridge and Linear Regression; for Lasso and Elastic Net the
+    unpenalized (alpha=0) form is used as an approximation.
+    """
+    train_rows, _ = train_test_split(np.arange(len(y)), test_size=TEST_SIZE, random_state=SPLIT_SEED)
+    Z = scaler.transform(pd.DataFrame(X[train_rows], columns=scaler.feature_names_in_))
+    y_train = np.asarray(y)[train_rows]
+    residuals = y_train - model.predict(Z)
+    alpha = model.alpha if isinstance(model, Ridge) else 0.0
+    return interval_arrays(Z.T @ Z, len(y_train), alpha, residuals @ residuals, scaler.mean_, scaler.scale_)
+
+
+def make_estimator(name, params):
+    """Unfitted model of the searched family ``name``"""
+    if name == 'Linear Regression':
+        return LinearRegression()
+    if name == 'Ridge':
+        return Ridge(**params)
+    if name == 'Lasso':
+        return Lasso(max_iter=5000, **params)
+    return ElasticNet(max_iter=5000, **params)
+
+
+def cv_path(name, X, y, train_idx, val_idx, l1_ratio=None):
+    """Validation R² of one model family along its alpha grid, for one fold.
+
+    Ridge solves every alpha from a single SVD of the fold's design matrix;
+    Lasso and Elastic Net walk the grid from the strongest penalty down,
+    warm-starting coordinate descent from the previous solution.
+    """
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(X[train_idx])
+    X_val = scaler.transform(X[val_idx])
+    y_train, y_val = y[train_idx], y[val_idx]
+
+    def r2(pred):
+        return 1 - np.sum((y_val - pred) ** 2) / np.sum((y_val - y_val.mean()) ** 2)
+
+    alphas = SEARCH_GRIDS[name].get('alpha')
+    if alphas is None:
+        return [r2(LinearRegression().fit(X_train, y_train).predict(X_val))]
+
+    if name == 'Ridge':
+        # Scaled features are centered, so only y needs centering for the intercept
+        y_mean = y_train.mean()
+        U, sv, Vt = np.linalg.svd(X_train, full_matrices=False)
+        Uty = U.T @ (y_train - y_mean)
+        return [r2(X_val @ (Vt.T @ (sv / (sv ** 2 + alpha) * Uty)) + y_mean) for alpha in alphas]
+
+    params = {'l1_ratio': l1_ratio} if l1_ratio is not None else {}
+    estimator = make_estimator(name, params)
+    estimator.set_params(warm_start=True)
+    scores = {}
+    for alpha in sorted(alphas, reverse=True):
+        estimator.set_params(alpha=alpha)
+        scores[alpha] = r2(estimator.fit(X_train, y_train).predict(X_val))
+    return [scores[alpha] for alpha in alphas]
+
+
+def search_models(X, y, feature_columns, folds=SEARCH_FOLDS, n_jobs=-1):
+    """Cross-validate every model family over its grid on all cores; refit the best of each.
+
+    Folds are drawn from the training split only, so the test split stays
+    held out for the final comparison. Every task shares the one encoded
+    design matrix (joblib memory-maps it into the workers).
+    Returns the winning model and scaler and the metrics of every family.
+    """
+    from joblib import Parallel, delayed
+
+    X = np.asarray(X, dtype=np.float64)
+    train_rows, _ = train_test_split(np.arange(len(y)), test_size=TEST_SIZE, random_state=SPLIT_SEED)
+    X_train, y_train = X[train_rows], y[train_rows]
+    splits = list(KFold(folds, shuffle=True, random_state=SPLIT_SEED).split(X_train))
+
+    tasks = [(name, l1_ratio) for name, grid in SEARCH_GRIDS.items()
+             for l1_ratio in grid.get('l1_ratio', [None])]
+    fold_scores = Parallel(n_jobs=n_jobs)(
+        delayed(cv_path)(name, X_train, y_train, train_idx, val_idx, l1_ratio)
+        for name, l1_ratio in tasks for train_idx, val_idx in splits
+    )
+
+    results = []
+    for i, (name, l1_ratio) in enumerate(tasks):
+        scores = np.array(fold_scores[i * folds:(i + 1) * folds])
+        best = int(np.argmax(scores.mean(axis=0)))
+        params = {}
+        if 'alpha' in SEARCH_GRIDS[name]:
+            params['alpha'] = float(SEARCH_GRIDS[name]['alpha'][best])
+        if l1_ratio is not None:
+            params['l1_ratio'] = l1_ratio
+        results.append({
+            'model': name,
+            'params': params,
+            'cv_r2': float(scores[:, best].mean()),
+            'cv_r2_std': float(scores[:, best].std()),
+        })
+
+    # Keep the best grid point of each family, then refit it on the full training split
+    best_by_family = {}
+    for result in results:
+        if result['model'] not in best_by_family or result['cv_r2'] > best_by_family[result['model']]['cv_r2']:
+            best_by_family[result['model']] = result
+
+    fitted = {}
+    for name, result in best_by_family.items():
+        model, scaler, scores = fit_model(X, y, feature_columns, make_estimator(name, result['params']))
+        result.update(scores)
+        fitted[name] = (model, scaler, scores)
+
+    winner = max(best_by_family, key=lambda name: best_by_family[name]['cv_r2'])
+    model, scaler, scores = fitted[winner]
+    metrics = {
+        'selected': best_by_family[winner],
+        'cv_folds': folds,
+        'models': list(best_by_family.values()),
+    }
+    return model, scaler, scores, metrics
+
+
+def write_metrics(output_dir, metrics):
+    with open(os.path.join(output_dir, METRICS_FILE), "w") as f:
+        json.dump(metrics, f, indent=2)
+
+
+class SufficientStats:
+    """Running mean and centered cross-products of a feature matrix and target.
+
+    Chunks are merged with the pairwise update of Chan et al., which stays
+    accurate where accumulating raw X^T X and subtracting n * mean^2 would not.
+    Memory is O(n_features^2) whatever the number of rows.
+    """
+
+    def __init__(self, n_features):
+        self.n = 0
+        self.mean = np.zeros(n_features)
+        self.y_mean = 0.0
+        self.xx = np.zeros((n_features, n_features))
+        self.xy = np.zeros(n_features)
+        self.yy = 0.0
+
+    def update(self, X, y):
+        n_b = len(y)
+        if n_b == 0:
+            return
+        mean_b = X.mean(axis=0)
+        y_mean_b = y.mean()
+        Xc = X - mean_b
+        yc = y - y_mean_b
+
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        delta_y = y_mean_b - self.y_mean
+        weight = self.n * n_b / n
+
+        self.xx += Xc.T @ Xc + np.outer(delta, delta) * weight
+        self.xy += Xc.T @ yc + delta * delta_y * weight
+        self.yy += yc @ yc + delta_y * delta_y * weight
+        self.mean += delta * n_b / n
+        self.y_mean += delta_y * n_b / n
+        self.n = n
+
+    def sse(self, coef, intercept):
+        """Sum of squared residuals of the linear model ``X @ coef + intercept`` on the accumulated rows"""
+        residual_mean = self.y_mean - intercept - self.mean @ coef
+        return self.yy - 2 * coef @ self.xy + coef @ self.xx @ coef + self.n * residual_mean ** 2
+
+    def scores(self, coef, intercept, prefix):
+        """R² and RMSE of the linear model, keyed with ``prefix``"""
+        sse = self.sse(coef, intercept)
+        return {f'{prefix}_r2': float(1 - sse / self.yy), f'{prefix}_rmse': float(np.sqrt(sse / self.n))}
+
+
+def solve_ridge(stats, alpha, feature_columns):
+    """Fit StandardScaler + Ridge from sufficient statistics, as fit_model does on a dense matrix"""
+    from scipy import linalg
+
+    n = stats.n
+    var = np.diag(stats.xx) / n
+    # StandardScaler's test for constant features, which it leaves unscaled
+    eps = np.finfo(np.float64).eps
+    constant = var <= n * eps * var + (n * stats.mean * eps) ** 2
+    scale = np.where(constant, 1.0, np.sqrt(var))
+
+    # Scaled features are already centered, so Ridge's centering is a no-op
+    A = stats.xx / np.outer(scale, scale)
+    A[np.diag_indices_from(A)] += alpha
+    coef = linalg.solve(A, stats.xy / scale, assume_a='pos')
+
+    scaler = StandardScaler()
+    scaler.feature_names_in_ = np.array(feature_columns, dtype=object)
+    scaler.n_features_in_ = len(feature_columns)
+    scaler.n_samples_seen_ = n
+    scaler.mean_ = stats.mean.copy()
+    scaler.var_ = var
+    scaler.scale_ = scale
+
+    model = Ridge(alpha=alpha)
+    model.n_features_in_ = len(feature_columns)
+    model.coef_ = coef
+    model.intercept_ = stats.y_mean
+    model.n_iter_ = None
+    model.solver_ = 'cholesky'
+    return model, scaler
+
+
+def read_chunks(data_path, chunksize):
+    """Cleaned chunks of the training CSV"""
+    for chunk in pd.read_csv(data_path, chunksize=chunksize):
+        yield clean_data(chunk)
+
+
+def scan_data(data_path, chunksize):
+    """Streaming pass 1: column types, imputation values and target moments"""
+    object_cols, float_cols = set(), set()
+    sums, counts = {}, {}
+    category_counts = {}
+    price = SufficientStats(0)
+
+    for chunk in read_chunks(data_path, chunksize):
+        for col in chunk.columns:
+            if chunk[col].dtype == object:
+                object_cols.add(col)
+            elif chunk[col].dtype == np.float64:
+                float_cols.add(col)
+            if chunk[col].dtype == object or col in DISCRETE_COLS:
+                # Count in order of first appearance, as the in-memory mode does
+                codes, uniques = pd.factorize(chunk[col])
+                totals = category_counts.setdefault(col, {})
+                for value, count in zip(uniques, np.bincount(codes[codes >= 0], minlength=len(uniques))):
+                    totals[value] = totals.get(value, 0) + int(count)
+            else:
+                sums[col] = sums.get(col, 0.0) + float(chunk[col].sum())
+                counts[col] = counts.get(col, 0) + int(chunk[col].count())
+        price.update(np.zeros((len(chunk), 0)), chunk['Sale_Price'].to_numpy(dtype=np.float64))
+
+    columns = list(chunk.columns)
+    # An all-missing chunk of a text column parses as float; the column is text if any chunk was
+    dtypes = {col: object if col in object_cols else (np.float64 if col in float_cols else np.int64)
+              for col in columns}
+    fill_values = {col: sums[col] / counts[col] for col in columns
+                   if dtypes[col] is not object and counts.get(col)}
+    for col, totals in category_counts.items():
+        if totals:
+            value = max(totals, key=totals.get)
+            fill_values[col] = int(value) if col in DISCRETE_COLS else value
+
+    std = np.sqrt(price.yy / price.n)
+    bounds = (price.y_mean - OUTLIER_Z_THRESHOLD * std, price.y_mean + OUTLIER_Z_THRESHOLD * std)
+    return dtypes, fill_values, bounds
+
+
+def prepare_chunk(chunk, dtypes, fill_values, bounds):
+    """Apply the fitted imputation, outlier filter and category codes to one chunk"""
+    chunk = impute(chunk.astype(dtypes), fill_values)
+    chunk = chunk.drop(columns=[col for col in QUASI_CONSTANT_FEATURES if col in chunk.columns])
+    price = chunk['Sale_Price']
+    chunk = chunk[(price >= bounds[0]) & (price <= bounds[1])]
+    return to_codes(chunk, categorical_columns(chunk))
+
+
+def train_streaming(data_path, chunksize=STREAMING_CHUNK_SIZE):
+    """Fit the model without holding the data in memory.
+
+    Returns the model, scaler, scores, encodings and prediction-interval arrays.
+
+    Pass 1 fits the imputation and the outlier bounds, pass 2 collects the
+    category vocabulary of the kept rows and pass 3 accumulates sufficient
+    statistics for the train and test rows. Peak memory is one chunk plus
+    the O(n_features^2) statistics, and one byte per kept row for the
+    train/test split, which is drawn exactly as train_test_split would.
+    """
+    dtypes, fill_values, bounds = scan_data(data_path, chunksize)
+
+    # Pass 2: vocabulary, numeric ranges and row count after imputation and outlier removal
+    vocabulary = {}
+    ranges = {}
+    n_rows = 0
+    for chunk in read_chunks(data_path, chunksize):
+        chunk = prepare_chunk(chunk, dtypes, fill_values, bounds)
+        n_rows += len(chunk)
+        categorical = [col for col in chunk.columns if isinstance(chunk[col].dtype, pd.CategoricalDtype)]
+        for col in categorical:
+            vocabulary.setdefault(col, set()).update(chunk[col].cat.categories)
+        for col in chunk.columns.difference(categorical + ['Sale_Price'], sort=False):
+            lo, hi = ranges.get(col, (np.inf, -np.inf))
+            ranges[col] = [min(lo, float(chunk[col].min())), max(hi, float(chunk[col].max()))]
+
+    # Same column layout as get_dummies: numeric columns, then sorted dummies per categorical
+    fields = [col for col in chunk.columns if col != 'Sale_Price' and col not in vocabulary]
+    fields += list(vocabulary)
+    feature_columns = [col for col in fields if col not in vocabulary]
+    for col, values in vocabulary.items():
+        feature_columns += [f"{col}_{value}" for value in sorted(values)]
+    pipeline = make_pipeline({col: fill_values[col] for col in fields if col in fill_values})
+    encoder = FeatureEncoder(feature_columns, fields=fields, pipeline=pipeline)
+
+    train_rows, _ = train_test_split(np.arange(n_rows), test_size=TEST_SIZE, random_state=SPLIT_SEED)
+    is_train = np.zeros(n_rows, dtype=bool)
+    is_train[train_rows] = True
+    del train_rows
+
+    # Pass 3: sufficient statistics of the train and test rows
+    train, test = SufficientStats(len(feature_columns)), SufficientStats(len(feature_columns))
+    offset = 0
+    for chunk in read_chunks(data_path, chunksize):
+        chunk = prepare_chunk(chunk, dtypes, fill_values, bounds)
+        X = encoder.encode_frame_dense(chunk[fields])
+        y = chunk['Sale_Price'].to_numpy(dtype=np.float64)
+        mask = is_train[offset:offset + len(chunk)]
+        train.update(X[mask], y[mask])
+        test.update(X[~mask], y[~mask])
+        if offset == 0:
+            golden_index, golden_features = chunk.index[:GOLDEN_ROWS], X[:GOLDEN_ROWS]
+        offset += len(chunk)
+    # The golden rows come from the first chunk
+    raw = pd.read_csv(data_path, nrows=chunksize)
+
+    model, scaler = solve_ridge(train, RIDGE_ALPHA, feature_columns)
+    fused_coef = model.coef_ / scaler.scale_
+    fused_intercept = model.intercept_ - fused_coef @ scaler.mean_
+    scores = {
+        **train.scores(fused_coef, fused_intercept, 'train'),
+        **test.scores(fused_coef, fused_intercept, 'test'),
+    }
+    interval = interval_arrays(
+        train.xx / np.outer(scaler.scale_, scaler.scale_), train.n, RIDGE_ALPHA,
+        train.sse(fused_coef, fused_intercept), scaler.mean_, scaler.scale_
+    )
+    encodings = {
+        'pipeline': pipeline,
+        'ranges': {col: ranges[col] for col in fields if col in ranges},
+        'feature_columns': feature_columns,
+        **golden_set(raw, golden_index, fields, golden_features),
+    }
+    return model, scaler, scores, encodings, interval
+
+
+def save_artifacts(model, scaler, encodings, output_dir=".", interval=None):
+    """Stage 5: pickles for the sklearn path plus the memory-mappable bundle (with interval arrays if given)"""
+    feature_columns = encodings['feature_columns']
+
+    with open(os.path.join(output_dir, "model.pkl"), "wb") as f:
         pickle.dump(model, f)
-    
-    with open("scaler.pkl", "wb") as f:
+
+    with open(os.path.join(output_dir, "scaler.pkl"), "wb") as f:
         pickle.dump(scaler, f)
-    
-    with open("feature_columns.pkl", "wb") as f:
-        pickle.dump(df_encoded.columns.tolist(), f)
-    
+
+    with open(os.path.join(output_dir, "feature_columns.pkl"), "wb") as f:
+        pickle.dump(feature_columns, f)
+
+    arrays = bundle_arrays(model, scaler, feature_columns)
+    arrays.update(interval or {})
+    arrays['golden_features'] = np.asarray(encodings['golden_features'], dtype=np.float64)
+
+    # The fitted preprocessing pipeline, the raw numeric ranges (for input
+    # validation at serving time) and the golden records travel with the bundle
+    return save_bundle(
+        os.path.join(output_dir, "model_bundle"),
+        arrays,
+        metadata={'pipeline': encodings['pipeline'], 'ranges': encodings.get('ranges', {}),
+                  'golden_records': encodings['golden_records']}
+    )
+
+
+def train_and_save_model(data_path=DATA_PATH, cache_dir=CACHE_DIR, output_dir=".", streaming=False,
+                         chunksize=STREAMING_CHUNK_SIZE, search=False, folds=SEARCH_FOLDS, n_jobs=-1):
+    """Train the Ridge Regression model and save it for the FastAPI app.
+
+    Parsing and preprocessing are cached under ``cache_dir`` (None disables
+    the cache), so a rerun on an unchanged CSV goes straight to fitting.
+    With ``streaming`` the CSV is instead read in chunks and never held in
+    memory as a whole. With ``search`` the model family and hyperparameters
+    are chosen by cross-validation instead of fitting Ridge(alpha=1).
+    """
+    timings = {}
+    start = time.perf_counter()
+
+    if streaming:
+        print(f"Training Ridge Regression model from {chunksize}-row chunks...")
+        model, scaler, scores, encodings, interval = train_streaming(data_path, chunksize)
+        timings['stream'] = time.perf_counter() - start
+        return finish_training(model, scaler, scores, encodings, output_dir, timings, interval=interval)
+
+    data_key = file_key(data_path)
+    features_cached = cache_dir and os.path.exists(os.path.join(cache_dir, f"features-{data_key}", "encodings.json"))
+    if features_cached:
+        print("Using cached features...")
+        df = None
+    else:
+        print("Loading dataset...")
+        df = load_data(data_path, cache_dir)
+    timings['load'] = time.perf_counter() - start
+
+    print("Preprocessing features...")
+    start = time.perf_counter()
+    X, y, encodings = build_features(df, data_key, cache_dir)
+    timings['preprocess'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if search:
+        print(f"Cross-validating {', '.join(SEARCH_GRIDS)} over {folds} folds...")
+        model, scaler, scores, metrics = search_models(X, y, encodings['feature_columns'], folds, n_jobs)
+        for result in metrics['models']:
+            print(f"  {result['model']:>17}: CV R² {result['cv_r2']:.4f} ± {result['cv_r2_std']:.4f}, "
+                  f"test R² {result['test_r2']:.4f} {result['params']}")
+        print(f"Selected {metrics['selected']['model']} {metrics['selected']['params']}")
+        timings['search'] = time.perf_counter() - start
+    else:
+        print("Training Ridge Regression model...")
+        model, scaler, scores = fit_model(X, y, encodings['feature_columns'])
+        metrics = None
+        timings['fit'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    interval = fit_interval(X, y, model, scaler)
+    timings['interval'] = time.perf_counter() - start
+
+    return finish_training(model, scaler, scores, encodings, output_dir, timings, metrics, interval)
+
+
+def finish_training(model, scaler, scores, encodings, output_dir, timings, metrics=None, interval=None):
+    """Report scores, save the artifacts and metrics and print the stage timings"""
+    if metrics is None:
+        result = {'model': 'Ridge', 'params': {'alpha': RIDGE_ALPHA}, **scores}
+        metrics = {'selected': result, 'models': [result]}
+
+    print(f"Training R² Score: {scores['train_r2']:.4f}")
+    print(f"Testing R² Score: {scores['test_r2']:.4f}")
+
+    # Save the model, scaler, and feature columns
+    print("Saving model and scaler...")
+    start = time.perf_counter()
+    manifest = save_artifacts(model, scaler, encodings, output_dir, interval)
+    write_metrics(output_dir, {'model_version': manifest['model_version'], **metrics})
+    timings['save'] = time.perf_counter() - start
+
     print("Model training completed successfully!")
-    print("Files saved: model.pkl, scaler.pkl, feature_columns.pkl")
-    
-    return model, scaler, df_encoded.columns.tolist()
+    print(f"Files saved: model.pkl, scaler.pkl, feature_columns.pkl, {METRICS_FILE}, "
+          f"model_bundle/ (version {manifest['model_version']})")
+    print("Stage timings: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items()))
+
+    return model, scaler, encodings['feature_columns']
+
+
+def add_shared_options(parser, defaults=True):
+    """Options accepted before or after the subcommand.
+
+    The subcommand's copies have no defaults, so an option it is not given
+    keeps the value given before it.
+    """
+    def default(value):
+        return value if defaults else argparse.SUPPRESS
+
+    parser.add_argument("--data", default=default(DATA_PATH))
+    parser.add_argument("--cache-dir", default=default(CACHE_DIR))
+    parser.add_argument("--no-cache", action="store_true", default=default(False),
+                        help="parse and preprocess from scratch")
+    parser.add_argument("--output-dir", default=default("."))
+    parser.add_argument("--streaming", action="store_true", default=default(False),
+                        help="train out of core from CSV chunks")
+    parser.add_argument("--chunksize", type=int, default=default(STREAMING_CHUNK_SIZE))
+
 
 if __name__ == "__main__":
-    from scipy import stats
-    train_and_save_model() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the house price model")
+    subparsers = parser.add_subparsers(dest="command")
+    search = subparsers.add_parser("search", help="cross-validate Linear, Ridge, Lasso and Elastic Net; keep the best")
+    search.add_argument("--folds", type=int, default=SEARCH_FOLDS)
+    search.add_argument("--jobs", type=int, default=-1, help="parallel workers (-1 = all cores)")
+    add_shared_options(parser)
+    add_shared_options(search, defaults=False)
+    args = parser.parse_args()
+
+    if args.command == "search" and args.streaming:
+        parser.error("search needs the in-memory design matrix; drop --streaming")
+
+    train_and_save_model(args.data, None if args.no_cache else args.cache_dir, args.output_dir,
+                         args.streaming, args.chunksize, search=args.command == "search",
+                         folds=getattr(args, "folds", SEARCH_FOLDS), n_jobs=getattr(args, "jobs", -1))
@@ -0,0 +1,100 @@
+import math
+import threading
+
+from preprocessing import CUBE_ROOT_FEATURES, LOG_FEATURES, category_key
+
+
+class InvalidInputError(ValueError):
+    """A record was rejected by ``InputValidator``; ``problems`` lists the offending fields"""
+
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__("Invalid input: " + "; ".join(f"{p['field']}: {p['error']}" for p in problems))
+
+
+class InputValidator:
+    """Fast-fail checks of raw property records against the training vocabulary and ranges.
+
+    Built once per loaded model from the encoder (categorical vocabulary) and
+    the bundle's training ranges. ``check`` is a dict/set lookup per field, so
+    bad records are turned away before any encoding or pandas work:
+
+    - categorical values never seen in training are rejected instead of
+      silently encoding as all-zero dummies
+    - numbers that are missing, non-finite or outside the transform's domain
+      (log of a non-positive lot size, cube root of a negative area) are rejected
+    - numbers outside the training range are counted, and clamped into it
+      when ``clamp`` is set
+
+    Per-field counters show which inputs drift away from the training data.
+    """
+
+    def __init__(self, encoder, ranges=None, clamp=False):
+        self.vocabulary = {field: frozenset(values) for field, values in encoder.category_index.items()}
+        self.numeric_fields = list(encoder.numeric_index)
+        self.ranges = {field: tuple(bounds) for field, bounds in (ranges or {}).items()}
+        self.clamp = clamp
+        self.stats = {"checked": 0, "rejected": 0}
+        self.field_stats = {}
+        self._lock = threading.Lock()
+
+    def _problem(self, problems, field, kind, error):
+        problems.append({"field": field, "error": error})
+        self._count(field, kind)
+
+    def _count(self, field, kind):
+        counts = self.field_stats.setdefault(field, {"unknown": 0, "invalid": 0, "out_of_range": 0, "clamped": 0})
+        counts[kind] += 1
+
+    def check(self, record):
+        """Validate a record, clamping out-of-range numbers in place if configured.
+
+        Raises InvalidInputError listing every rejected field.
+        """
+        problems = []
+        with self._lock:
+            self.stats["checked"] += 1
+
+            for field, vocabulary in self.vocabulary.items():
+                value = record.get(field)
+                # None is a missing value; the encoder fills it with the absent or most frequent category.
+                # JSON may carry a count as 2.0; it names the same category as 2, as it does when encoded
+                if value is not None and category_key(value) not in vocabulary:
+                    self._problem(problems, field, "unknown", f"unknown category {value!r}")
+
+            for field in self.numeric_fields:
+                value = record.get(field)
+                try:
+                    number = float(value)
+                except (TypeError, ValueError):
+                    self._problem(problems, field, "invalid", f"expected a number, got {value!r}")
+                    continue
+                if not math.isfinite(number):
+                    self._problem(problems, field, "invalid", f"must be finite, got {value!r}")
+                elif field in LOG_FEATURES and number <= 0:
+                    self._problem(problems, field, "invalid", f"must be positive, got {value!r}")
+                elif field in CUBE_ROOT_FEATURES and number < 0:
+                    self._problem(problems, field, "invalid", f"must not be negative, got {value!r}")
+                elif field in self.ranges:
+                    lo, hi = self.ranges[field]
+                    if not lo <= number <= hi:
+                        self._count(field, "out_of_range")
+                        if self.clamp:
+                            record[field] = min(max(number, lo), hi)
+                            self._count(field, "clamped")
+
+            if problems:
+                self.stats["rejected"] += 1
+        if problems:
+            raise InvalidInputError(problems)
+        return record
+
+    def snapshot(self):
+        """Totals plus the per-field counters of fields that have been flagged"""
+        with self._lock:
+            return {
+                **self.stats,
+                "ranges_known": bool(self.ranges),
+                "clamp": self.clamp,
+                "fields": {field: dict(counts) for field, counts in self.field_stats.items()},
+            }